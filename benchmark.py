@@ -0,0 +1,155 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from handler import Handler
+
+# same strings as the simulator dropdowns, Core parses them the same way
+EXPLORATION_MODES = ["Left Wall Hugging", "Left Wall Hugging (Return Home)",
+                     "Left Wall Hugging (Optimized, Return Home)",
+                     "Left Wall Hugging (Optimized, Return Home, D* Lite)",
+                     "Information Gain", "Information Gain (Return Home)",
+                     "Image Recognition", "Image Recognition (Return Home)",
+                     "Image Recognition (Partial, Return Home)"]
+FASTEST_PATH_MODES = ["A* Search", "A* Search (With Diagonals)", "D* Lite", "D* Lite (With Diagonals)"]
+
+FIELDS = ['map', 'mode', 'coverage', 'steps', 'turns', 'ticks', 'completed', 'reached', 'wall_time',
+          'planner_time', 'planner_calls']
+
+
+def load_descriptors(directory):
+    descriptors = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "r") as f:
+            descriptor = f.readline().strip()
+        if descriptor:
+            descriptors.append((filename, descriptor))
+    return descriptors
+
+
+# runs a single map and mode headlessly, called in the worker processes
+def run_job(job):
+    name, descriptor, mode, args = job
+    logging.basicConfig(level=logging.WARNING)
+
+    handler = Handler()
+    handler.map.decode_map_descriptor(descriptor)
+    start = time.time()
+
+    if mode in FASTEST_PATH_MODES:
+        handler.map.mark_all_explored()
+        handler.core.findFP(-1, args['goal_x'], args['goal_y'], args['waypoint_x'], args['waypoint_y'], mode)
+        goal = (args['goal_x'], args['goal_y'])
+    else:
+        # decode_map_descriptor also fills in map_virtual, the robot has to discover it by itself
+        handler.reset()
+        handler.core.explore(-1, args['coverage'], args['time_limit'], mode)
+        goal = (1, config.map_size['height'] - 2)
+
+    ticks = handler.run(max_ticks=args['max_ticks'])
+    wall_time = time.time() - start
+
+    path_finders = [handler.core.path_finder, handler.core.incremental_path_finder]
+    return {
+        'map': name,
+        'mode': mode,
+        'coverage': round(handler.map.get_coverage(), 2),
+        'steps': handler.robot.move_count,
+        'turns': handler.robot.turn_count,
+        'ticks': ticks,
+        'completed': len(handler.pending) == 0,
+        'reached': handler.robot.get_location() == goal,
+        'wall_time': round(wall_time, 5),
+        'planner_time': round(sum(p.planning_time for p in path_finders), 5),
+        'planner_calls': sum(p.planning_calls for p in path_finders)
+    }
+
+
+def write_results(results, output, output_format):
+    f = open(output, "w", newline='') if output else sys.stdout
+
+    if output_format == 'json':
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    else:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+    if output:
+        f.close()
+
+
+def summarise(results, modes):
+    for mode in modes:
+        rows = [r for r in results if r['mode'] == mode]
+        if len(rows) == 0:
+            continue
+        logging.info("{}: {} maps, coverage {:0.2f}%, steps {:0.1f}, turns {:0.1f}, completed {}/{}, "
+                     "planner {:0.4f}s".format(mode, len(rows),
+                                               sum(r['coverage'] for r in rows) / len(rows),
+                                               sum(r['steps'] for r in rows) / len(rows),
+                                               sum(r['turns'] for r in rows) / len(rows),
+                                               sum(r['completed'] for r in rows), len(rows),
+                                               sum(r['planner_time'] for r in rows) / len(rows)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='MDP Maze Benchmark, runs exploration and fastest path headlessly over a directory of maps'
+    )
+    parser.add_argument("maps", help="Directory of map descriptor files, one descriptor on the first line of each")
+    parser.add_argument("-m", "--modes", nargs='+', default=["Left Wall Hugging (Optimized, Return Home)", "Information Gain"],
+                        choices=EXPLORATION_MODES + FASTEST_PATH_MODES, metavar='MODE',
+                        help="Exploration or fastest path modes to run: " +
+                             ", ".join(EXPLORATION_MODES + FASTEST_PATH_MODES))
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("-o", "--output", default=None, help="Output file, printed to stdout if not given")
+    parser.add_argument("-f", "--format", choices=['csv', 'json'], default=None,
+                        help="Output format, taken from the output file extension if not given")
+    parser.add_argument("--coverage", type=int, default=100, help="Exploration coverage figure")
+    parser.add_argument("--time-limit", type=int, default=360, help="Exploration time limit in seconds")
+    parser.add_argument("--max-ticks", type=int, default=5000, help="Ticks before a run is cut off")
+    parser.add_argument("--goal", type=int, nargs=2, default=[13, 1], metavar=('X', 'Y'))
+    parser.add_argument("--waypoint", type=int, nargs=2, default=[0, 0], metavar=('X', 'Y'))
+    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+
+    args = parser.parse_args()
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    output_format = args.format
+    if output_format is None:
+        output_format = 'json' if args.output and args.output.endswith('.json') else 'csv'
+
+    job_args = dict(
+        coverage=args.coverage,
+        time_limit=args.time_limit,
+        max_ticks=args.max_ticks,
+        goal_x=args.goal[0],
+        goal_y=args.goal[1],
+        waypoint_x=args.waypoint[0],
+        waypoint_y=args.waypoint[1]
+    )
+    jobs = [(name, descriptor, mode, job_args)
+            for name, descriptor in load_descriptors(args.maps) for mode in args.modes]
+    logging.info("Running {} jobs".format(len(jobs)))
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(run_job, jobs, chunksize=max(1, len(jobs) // 64)))
+    logging.info("Finished in {:0.2f} second".format(time.time() - start))
+
+    write_results(results, args.output, output_format)
+    summarise(results, args.modes)
@@ -1,10 +1,12 @@
-import sys
+import asyncio
 import threading
-import time
 import logging
-import random
-import socket
-from constants import arduino_queue, general_queue
+from collections import deque
+from queue import Full, Empty
+
+import config
+from constants import general_queue, control_queue
+from link_stats import link_stats
 
 # logging.basicConfig(level=logging.DEBUG,
 #                     format='(%(threadName)-9s) %(message)s', )
@@ -27,50 +29,273 @@ ANDROID_CMDS = [
 ]
 
 
-class ListenerThread(threading.Thread):
-    def __init__(self, group=None, target=None, name=None, socket=None, handler=None,
-                 args=(), kwargs=None, verbose=None):
-        super(ListenerThread, self).__init__()
-        self.target = target
-        self.name = name
-        self.socket = socket
-        self.handler = handler
-
-    def run(self):
-        while True:
-            if not arduino_queue.full():
-                msges = self.receive()
-
-                try:
-                    msges = msges.decode('cp1252')
-                except (UnicodeDecodeError, AttributeError):
-                    pass
-
-                for msg in msges.split('\n'):
-                    if msg:
-                        if msg[0] in ANDROID_CMDS or msg[:3] in ANDROID_CMDS:
-                            general_queue.put(msg)
-                            logging.debug(
-                                '[GQ] Putting ' + msg + ' (' + str(general_queue.qsize()) + ' items in queue)')
-                        else:
-                            arduino_queue.put(msg)
-                            logging.debug(
-                                '[AQ] Putting ' + msg + ' (' + str(arduino_queue.qsize()) + ' items in queue)')
-                        time.sleep(0.05)
-
-    def receive(self):
+# delivered ahead of every other message
+CONTROL_CMDS = [
+    STOP_IR,
+    RESET
+]
+
+
+def is_android_command(msg):
+    return msg[0] in ANDROID_CMDS or msg[:3] in ANDROID_CMDS
+
+
+# the command is the token before the payload, e.g. RS of RS|1 and I of I|2
+PAYLOAD_SEPARATOR = '|'
+CONTROL_TOKENS = [cmd.rstrip(PAYLOAD_SEPARATOR) for cmd in CONTROL_CMDS]
+
+
+def is_control_command(msg):
+    return msg.split(PAYLOAD_SEPARATOR, 1)[0] in CONTROL_TOKENS
+
+
+# the same test on a raw line, before it is decoded
+ANDROID_PREFIXES = [cmd.encode() for cmd in ANDROID_CMDS]
+
+
+def is_android_line(line):
+    return line[:1] in ANDROID_PREFIXES or line[:3] in ANDROID_PREFIXES
+
+
+# left back, left front, front left, front middle, front right, right
+SENSOR_FIELDS = 6
+
+# the socket is read into one buffer that is reused for the whole connection, it only grows for longer lines
+READ_BUFFER_SIZE = 1024
+MAX_LINE_LENGTH = 64 * 1024
+
+
+# the queue keeps the newest messages, a full queue loses its oldest one. Safe from any thread.
+def put_dropping_oldest(queue, msg, name, stats):
+    while True:
         try:
-            msg = self.socket.recv(1024)
-            return msg
-        except socket.timeout:
-            return ""
-        except OSError:
-            logging.debug('OS Error.')
-            sys.exit()
-
-    def send(self, msg):
-        logging.debug("[Info] Sending message: " + str(msg))
+            queue.put_nowait(msg)
+            stats.message_queued(name)
+            return
+        except Full:
+            try:
+                dropped = queue.get_nowait()
+                stats.message_dropped(name)
+                logging.info("Message dropped from {}, the consumer is not keeping up: {}".format(name, dropped))
+            except Empty:
+                pass
+
+
+# messages from one peer, consumers await them instead of polling. Only touched from the event loop. Nothing is
+# ever dropped, a sensor reply lost here would be taken for the reading of a later move.
+class Channel:
+    def __init__(self, name, stats=None):
+        self.name = name
+        self.messages = deque()
+        self.waiters = deque()
+        self.stats = stats
+
+    def put(self, msg):
+        self.messages.append(msg)
+        if self.stats is not None:
+            self.stats.message_queued(self.name)
+        while len(self.waiters) > 0:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+    # returns once a message is available without taking it
+    async def wait(self):
+        while len(self.messages) == 0:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            await waiter
+
+    async def get(self):
+        await self.wait()
+        if self.stats is not None:
+            self.stats.message_taken(self.name)
+        return self.messages.popleft()
+
+    def clear(self):
+        self.messages.clear()
+        if self.stats is not None:
+            self.stats.queue_cleared(self.name)
+
+
+# cuts the byte stream into lines. A read may end in the middle of a line, the rest of it stays in the buffer
+# and is completed by the next read instead of being passed on as two messages.
+class LineFramer(asyncio.BufferedProtocol):
+    def __init__(self, on_line, on_closed):
+        self.on_line = on_line
+        self.on_closed = on_closed
+        self.transport = None
+        self.buffer = bytearray(READ_BUFFER_SIZE)
+        self.view = memoryview(self.buffer)
+        # unread bytes are buffer[start:end], none of them before scanned is a newline
+        self.start = 0
+        self.scanned = 0
+        self.end = 0
+        # lines thrown away for being longer than MAX_LINE_LENGTH, the rest of one is skipped up to its newline
+        self.overlong = 0
+        self.skipping = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        if self.end == len(self.buffer):
+            if self.start > 0:
+                # move the partial line to the front
+                length = self.end - self.start
+                self.buffer[:length] = bytes(self.view[self.start:self.end])
+                self.scanned -= self.start
+                self.start = 0
+                self.end = length
+            elif len(self.buffer) < MAX_LINE_LENGTH:
+                self.view.release()
+                self.buffer = self.buffer + bytearray(len(self.buffer))
+                self.view = memoryview(self.buffer)
+            else:
+                logging.info("Line longer than {} bytes dropped".format(MAX_LINE_LENGTH))
+                self.overlong += 1
+                self.skipping = True
+                self.start = self.scanned = self.end = 0
+
+        return self.view[self.end:]
+
+    def buffer_updated(self, nbytes):
+        self.end += nbytes
+
+        newline = self.buffer.find(b'\n', self.scanned, self.end)
+        while newline >= 0:
+            stop = newline
+            if stop > self.start and self.buffer[stop - 1] == 13:
+                stop -= 1
+            if self.skipping:
+                self.skipping = False
+            else:
+                # the view is only valid until the callback returns
+                self.on_line(self.view[self.start:stop], newline + 1 - self.start)
+            self.start = newline + 1
+            newline = self.buffer.find(b'\n', self.start, self.end)
+
+        if self.start == self.end:
+            self.start = self.end = 0
+        self.scanned = self.end
+
+    def connection_lost(self, error):
+        self.on_closed()
+
+
+# Line based link to the RPi. The event loop runs in its own thread, the framer hands it whole lines off the
+# socket which are routed by sender: sensor lines to the arduino channel, which the robot blocks on through the
+# thread safe wrappers below, stop and reset commands to control_queue and other android commands to
+# general_queue, both read by the simulator event loop. Routing never waits on a consumer. The android queues are
+# bounded and drop their oldest message when full, the arduino channel keeps every reply, at most one per step
+# of the commands sent.
+# Sensor lines are split into their byte fields straight from the read buffer, they are never decoded.
+class Transport:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='transport', daemon=True)
+        self.thread.start()
+        self.writer = None
+        self.connected = False
+        self.stats = link_stats
+        self.arduino = Channel('arduino', self.stats)
+
+    def call(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def connect(self, host, port, timeout=1):
+        self.call(self.open(host, port, timeout))
+        return self.connected
+
+    async def open(self, host, port, timeout):
+        self.writer, _ = await asyncio.wait_for(
+            self.loop.create_connection(lambda: LineFramer(self.route_line, self.connection_closed), host, port),
+            timeout)
+        self.connected = True
+        self.stats.reset()
+
+    def disconnect(self):
+        self.call(self.hang_up())
+
+    async def hang_up(self):
+        self.connected = False
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    # stops the loop thread for good, a closed transport cannot connect again
+    def close(self):
+        if self.loop.is_closed():
+            return
+
+        self.call(self.cancel_tasks())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def cancel_tasks(self):
+        await self.hang_up()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def route_line(self, line, length):
+        if len(line) == 0:
+            return
+
+        if is_android_line(line):
+            msg = str(line, 'cp1252')
+            self.stats.line_received('android', length)
+            logging.debug('[ANDROID] Received ' + msg)
+            if is_control_command(msg):
+                put_dropping_oldest(control_queue, msg, 'control_queue', self.stats)
+            else:
+                put_dropping_oldest(general_queue, msg, 'general_queue', self.stats)
+        else:
+            fields = line.tobytes().split()
+            if len(fields) != SENSOR_FIELDS:
+                logging.info("Unexpected arduino message: " + str(fields))
+            self.stats.line_received('arduino', length)
+            self.arduino.put(fields)
+            logging.debug('[ARDUINO] Received %s', fields)
+
+    def connection_closed(self):
+        if self.connected:
+            logging.info("Connection closed by the RPi.")
+        self.connected = False
+
+    # replies is the number of sensor lines the arduino answers the message with
+    def send(self, msg, replies=0):
+        if not self.connected:
+            return False
+
+        self.stats.message_sent(msg, replies)
+        self.loop.call_soon_threadsafe(self.write, str.encode(msg))
+        return True
+
+    def write(self, data):
+        if self.writer is not None:
+            self.writer.write(data)
+
+    # both raise TimeoutError when no line comes within timeout seconds, config.link_timeouts['reply'] by default
+    def wait_arduino(self, timeout=None):
+        self.call_arduino(self.arduino.wait(), timeout)
+
+    # the fields of the next arduino line, as bytes
+    def get_arduino(self, timeout=None):
+        return self.call_arduino(self.arduino.get(), timeout)
+
+    def call_arduino(self, coroutine, timeout):
+        if timeout is None:
+            timeout = config.link_timeouts['reply']
+
+        # the wait is cancelled on the loop, so it does not take the line once it comes
         try:
-            self.socket.sendall(str.encode(msg))
-        except socket.error as error:
-            logging.debug("Unable to send message. " + str(error))
+            return self.call(asyncio.wait_for(coroutine, timeout))
+        except asyncio.TimeoutError:
+            raise TimeoutError("No reply from the arduino within {} seconds".format(timeout)) from None
+
+    def clear_arduino(self):
+        self.stats.clear_pending()
+        self.loop.call_soon_threadsafe(self.arduino.clear)
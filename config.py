@@ -3,6 +3,55 @@ map_size = dict(
     width=15
 )
 
+# map updates sent to the android tablet: only the changed cells are sent, with the full map descriptor every
+# keyframe_interval messages or whenever more than max_delta_cells cells changed, which keeps every message
+# shorter than a keyframe. At most max_rate messages are sent per second, newer poses replace waiting ones.
+android_map = dict(
+    delta=True,
+    keyframe_interval=20,
+    max_delta_cells=12,
+    max_rate=5
+)
+
+# while spelunking or returning home the real robot is sent up to window commands of the plan at once, so the
+# arduino starts on the next move while the reply to the last one is read. 1 sends one command at a time.
+# A command sent ahead cannot be taken back, so it is only sent once every cell the robot passes over has been
+# seen free with a total weight of at least min_free_weight: a single reading adds at most 1000, see
+# Handler.get_weighted_obstacle, and cannot make such a cell an obstacle before the robot gets there.
+pipeline = dict(
+    window=3,
+    min_free_weight=1000
+)
+
+# spelunking heads for the frontier cell the robot reaches cheapest, turns included, instead of the first one
+# in map order, see ExplorationAlgo.spelunk_nearest
+spelunk = dict(
+    nearest=True
+)
+
+# information gain exploration heads for the pose whose sensors are expected to see the most unexplored cells per
+# unit of travel cost, an unexplored cell being free with free_probability. Poses expected to see fewer than
+# min_gain cells are passed over, see ExplorationAlgo.information_gain
+information_gain = dict(
+    free_probability=0.85,
+    min_gain=1
+)
+
+# tablet messages held for the simulator event loop, a full queue drops its oldest message. Stop and reset
+# commands have their own queue so a backlog of other messages never holds them up. Sensor replies from the
+# arduino are never dropped.
+link_queues = dict(
+    android=10,
+    control=10
+)
+
+# seconds the robot waits for a sensor reply before it asks the arduino for the reading again, and how many
+# times it asks before giving up on the link
+link_timeouts = dict(
+    reply=5,
+    retries=3
+)
+
 map_cells = [[None for _ in range(map_size['width'])] for _ in range(map_size['height'])]
 # map_cells = [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
 #              [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
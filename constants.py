@@ -1,8 +1,11 @@
 from enum import IntEnum
 from queue import Queue
 
-arduino_queue = Queue(10)
-general_queue = Queue(10)
+import config
+
+# android commands waiting for the simulator event loop, stop and reset are taken before the others
+general_queue = Queue(config.link_queues['android'])
+control_queue = Queue(config.link_queues['control'])
 
 
 class Bearing(IntEnum):
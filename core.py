@@ -1,4 +1,5 @@
 from fastest_path_algo import FastestPathAlgo
+from incremental_path_algo import IncrementalPathAlgo
 from exploration_algo import ExplorationAlgo
 
 
@@ -7,6 +8,7 @@ class Core:
         self.handler = handler
         self.map = self.handler.map
         self.path_finder = FastestPathAlgo(self.map, self.handler.robot, self.handler)
+        self.incremental_path_finder = IncrementalPathAlgo(self.map, self.handler.robot, self.handler)
         self.explorer = ExplorationAlgo(self.handler, self.path_finder)
 
     def reset(self):
@@ -25,12 +27,21 @@ class Core:
                 self.explorer.set_status(do_img_rec=True, partial_ir=True)
             else:
                 self.explorer.set_status(do_img_rec=True, partial_ir=False)
+        elif 'Information Gain' in exploration_algo:
+            self.explorer.set_optimized(True)
+            self.explorer.set_status(do_img_rec=False, partial_ir=False, information_gain=True)
         else:
             if 'Optimized' in exploration_algo:
                 self.explorer.set_optimized(True)
             else:
                 self.explorer.set_optimized(False)
             self.explorer.set_status(do_img_rec=False, partial_ir=False)
+
+        # spelunking and going home replan often after small map changes, which D* Lite repairs incrementally
+        if 'D* Lite' in exploration_algo:
+            self.explorer.set_path_finder(self.incremental_path_finder)
+        else:
+            self.explorer.set_path_finder(self.path_finder)
         self.explorer.sense()
         self.explorer.explore(delay, steps_per_second, coverage, time_limit, is_return_home, perform_fp=perform_fp)
 
@@ -48,5 +59,13 @@ class Core:
             self.path_finder.find_fastest_path(diag=True, delay=delay, goalX=goal_x, goalY=goal_y,
                                                waypointX=waypoint_x,
                                                waypointY=waypoint_y)
+        elif fp_algo == "D* Lite":
+            self.incremental_path_finder.find_fastest_path(diag=False, delay=delay, goalX=goal_x, goalY=goal_y,
+                                                           waypointX=waypoint_x,
+                                                           waypointY=waypoint_y)
+        elif fp_algo == "D* Lite (With Diagonals)":
+            self.incremental_path_finder.find_fastest_path(diag=True, delay=delay, goalX=goal_x, goalY=goal_y,
+                                                           waypointX=waypoint_x,
+                                                           waypointY=waypoint_y)
         else:
             self.explore(steps_per_second, 100, 3600, "Left Wall Hugging", perform_fp=True)
@@ -3,6 +3,7 @@ import time
 import config
 import numpy as np
 from constants import Bearing, MOVEMENT
+from fastest_path_algo import TURN_MOVEMENTS
 from map import *
 import logging
 
@@ -10,6 +11,7 @@ class STATUS:
     LEFT_WALL_HUGGING = "Left Wall Hugging",
     SPELUNKING = "Spelunking",  # use front sensors
     RETURN_HOME = "Return Home",
+    INFORMATION_GAIN = "Information Gain",  # go where the sensors see the most for the travel cost
     IMAGE_REC = "Image Rec"  # left wall hugging for image rec
 
 
@@ -33,6 +35,11 @@ class ExplorationAlgo:
         self.handler = handler
         self.map = self.handler.map
         self.path_finder = path_finder
+        # ranks the spelunking targets, kept when the path finder is switched to D* Lite
+        self.target_finder = path_finder
+        self.sensor_model = self.handler.sensor_model
+        # (x, y, bearing) information gain exploration is heading for
+        self.gain_target = None
         self.steps_per_second = -1
         self.coverage = 100
         self.time_limit = 360
@@ -49,6 +56,8 @@ class ExplorationAlgo:
         self.partial_ir = False
         self.completed_partial_exploration = False
         self.consecutive_left_turn = 0
+        # coverage at every tick of the current exploration
+        self.coverage_history = []
 
     def reset(self):
         self.handler.robot.update_map = True
@@ -60,6 +69,8 @@ class ExplorationAlgo:
         self.count = 0
         self.consecutive_left_turn = 0
         self.completed_partial_exploration = False
+        self.coverage_history = []
+        self.gain_target = None
         # for i in range(config.map_size['height']):
         #     for j in range(config.map_size['width']):
         #         self.map_img_rec[i][j] = 0
@@ -72,23 +83,31 @@ class ExplorationAlgo:
         self.start = time.time()
         self.return_home = return_home
         self.perform_fp = perform_fp
+        self.coverage_history = []
         self.periodic_check()
 
     def periodic_check(self):
+        if self.step():
+            self.handler.schedule(self.delay, self.periodic_check)
+
+    # one tick of the exploration state machine, returns False once exploration has ended
+    def step(self):
         # logging.debug("[Exploration] Periodic Check")
         current = time.time()
         elapsed = current - self.start
+        coverage = self.map.get_coverage()
+        self.coverage_history.append(coverage)
 
-        if self.map.get_coverage() >= self.coverage and self.handler.robot.update_map:
+        if coverage >= self.coverage and self.handler.robot.update_map:
             self.handler.robot.update_map = False
         if self.perform_fp:
             if self.handler.robot.x == 13 and self.handler.robot.y == 1:
-                return
+                return False
         else:
             # logging.debug("Elapsed: ", elapsed)
             if elapsed >= self.time_limit or \
  \
-                    (self.status != STATUS.IMAGE_REC and self.map.get_coverage() >= self.coverage and (
+                    (self.status != STATUS.IMAGE_REC and coverage >= self.coverage and (
                             not self.return_home or (
                             self.return_home and self.handler.robot.get_location() == (1, 18)))) or \
  \
@@ -99,16 +118,8 @@ class ExplorationAlgo:
                          'height'] *
                      config.map_size['width'] and
                      list(self.handler.robot.get_location()) == list(self.start_pos) and not self.return_home):
-                explored_hex, obstacles_hex = self.map.create_map_descriptor()
-                self.handler.simulator.text_area.insert('end', explored_hex, '\n\n')
-                self.handler.simulator.text_area.insert('end', obstacles_hex, '\n')
-                if self.status == STATUS.IMAGE_REC:
-                    self.handler.robot.signal_exploration_ended()
-                if self.return_home and self.handler.robot.get_location() == (1, 18):
-                    # time.sleep(7)
-                    self.reach_start()
-                self.handler.robot.calibrate()
-                return
+                self.end_exploration()
+                return False
 
         # if self.count == 300:
         #     self.stop_ir()
@@ -153,7 +164,7 @@ class ExplorationAlgo:
             self.spelunkprep()
 
         #  send robot back to the start when exploration coverage reached
-        elif self.map.get_coverage() >= self.coverage and self.return_home and self.handler.robot.get_location() != (
+        elif coverage >= self.coverage and self.return_home and self.handler.robot.get_location() != (
                 1, 18) and \
                 self.status != STATUS.RETURN_HOME:
             self.go_home()
@@ -162,12 +173,20 @@ class ExplorationAlgo:
             self.left_wall_hugging()
         elif self.status == STATUS.LEFT_WALL_HUGGING:
             self.left_wall_hugging()
+        elif self.status == STATUS.INFORMATION_GAIN:
+            self.information_gain()
         else:
+            self.stream_plan()
             if len(self.movements) <= 0:
                 self.spelunkprep()
                 if len(self.movements) <= 0:
                     if self.return_home:
                         self.go_home()
+                    else:
+                        # nothing left to spelunk and nowhere to go, what cannot be seen now never will be
+                        logging.debug("[EXPLORATION] No spelunking target left, ending exploration")
+                        self.end_exploration()
+                        return False
 
             if self.status == STATUS.SPELUNKING:
                 self.move_and_sense()
@@ -180,7 +199,19 @@ class ExplorationAlgo:
                 except:
                     pass
 
-        self.handler.simulator.job = self.handler.simulator.root.after(self.delay, self.periodic_check)
+        return True
+
+    # report the explored map to the observers and hand the robot back
+    def end_exploration(self):
+        self.finish_streamed()
+        explored_hex, obstacles_hex = self.map.create_map_descriptor()
+        self.handler.exploration_completed(explored_hex, obstacles_hex)
+        if self.status == STATUS.IMAGE_REC:
+            self.handler.robot.signal_exploration_ended()
+        if self.return_home and self.handler.robot.get_location() == (1, 18):
+            # time.sleep(7)
+            self.reach_start()
+        self.handler.robot.calibrate()
 
     def left_wall_hugging(self):
         logging.debug("Consecutive left turn: " + str(self.consecutive_left_turn))
@@ -243,7 +274,49 @@ class ExplorationAlgo:
                     self.movements.append(MOVEMENT.RIGHT)
         self.move_and_sense()
 
+    # follows the plan to the pose with the best expected gain for its travel cost. The robot senses on the way,
+    # so a new target is chosen once the target has nothing left to show. When no reachable pose has, the cells
+    # left are out of sight of every pose and exploration goes on as spelunking.
+    def information_gain(self):
+        if len(self.movements) > 0 and self.sensor_model.pose_gain(
+                self.map, *self.gain_target, config.information_gain['free_probability']) < \
+                config.information_gain['min_gain']:
+            logging.debug("[EXPLORATION] Target {} seen on the way, replanning".format(self.gain_target))
+            self.finish_streamed()
+            self.movements.clear()
+
+        self.stream_plan()
+        if len(self.movements) <= 0:
+            self.gain_prep()
+            if len(self.movements) <= 0:
+                logging.debug("[EXPLORATION] Nothing left in sight of a reachable pose, spelunking")
+                self.status = STATUS.SPELUNKING
+                return
+
+        self.move_and_sense()
+
+    def gain_prep(self):
+        gain = self.sensor_model.expected_gain(self.map, config.information_gain['free_probability'])
+        min_gain = config.information_gain['min_gain']
+
+        def score(x, y, bearing, g):
+            pose_gain = gain[y, x, int(bearing / 2)]
+            return pose_gain / g if pose_gain >= min_gain else None
+
+        goal, movements = self.target_finder.find_best_goal(score)
+        if goal is None:
+            return
+
+        logging.debug("[EXPLORATION] Heading for {}, {:0.1f} cells expected".format(
+            goal, gain[goal[1], goal[0], int(goal[2] / 2)]))
+        self.gain_target = goal
+        self.movements = movements
+
     def move_and_sense(self, sense=True):
+        if len(self.movements) <= 0:
+            logging.debug("[EXPLORATION] No movement planned")
+            return
+
         ir = (self.status == STATUS.IMAGE_REC)
         if self.optimized:
             num_move = 1
@@ -334,6 +407,9 @@ class ExplorationAlgo:
     def spelunkprep(self):
         if self.max_move > 1:
             self.max_move = 1
+        if self.status != STATUS.IMAGE_REC and config.spelunk['nearest']:
+            self.spelunk_nearest()
+            return
         if self.status == STATUS.IMAGE_REC:
             result, dir = self.get_image_rec_target()
             logging.debug("Getting image rec target")
@@ -406,18 +482,44 @@ class ExplorationAlgo:
         except IndexError:
             pass
 
+    # one sweep from the robot prices every pose facing a frontier cell by its travel cost, and the path to the
+    # cheapest one becomes the plan, so no path is planned to a target on the far side of the arena
+    def spelunk_nearest(self):
+        goals = self.map.get_frontier_poses()
+        goal, movements = self.target_finder.find_nearest_goal(goals)
+        if goal is None:
+            logging.debug("Warning: Unable to reach unexplored tile. Ending Exploration early.")
+            return
+
+        logging.debug("[EXPLORATION] Spelunking towards {} from {}".format(goals[goal], goal))
+        if self.path_finder is not self.target_finder:
+            # D* Lite plans the way to the target, so heading for the same target again after the map changed
+            # repairs its search tree instead of searching from scratch
+            movements = self.plan_to_pose(*goal) or movements
+        self.movements = movements
+
+    # movements to the (x, y, bearing) pose planned by the selected path finder, the turns to face the bearing
+    # at the end included. None when there is no path.
+    def plan_to_pose(self, x, y, bearing):
+        robot_x, robot_y = self.handler.robot.get_location()
+        movements = self.path_finder.find_fastest_path(diag=False, delay=0, goalX=x, goalY=y, waypointX=0,
+                                                       waypointY=0, startX=robot_x, startY=robot_y, sim=False)
+        if movements is None:
+            return None
+
+        arrival = self.handler.robot.bearing
+        for movement in movements:
+            if movement == MOVEMENT.LEFT:
+                arrival = Bearing.prev_bearing(arrival)
+            elif movement == MOVEMENT.RIGHT:
+                arrival = Bearing.next_bearing(arrival)
+        return list(movements) + TURN_MOVEMENTS[(bearing - arrival) % 8]
+
+    # the frontier only holds unexplored cells with a free pose in front, so the first one is always a target
     def get_spelunk_target(self):
-        unexplored_grids = self.map.get_unexplored_grids()
-        result = None
-        dir = None
-        while result == None and len(unexplored_grids) > 0:
-            unknown_grid = unexplored_grids.pop(0)
-            # logging.debug("[CORE] Unknown grid: ", unknown_grid[0], unknown_grid[1])
-            try:
-                result, dir = self.map.find_adjacent_free_space_front(unknown_grid[0], unknown_grid[1])
-                self.add_bearing(dir)
-            except:
-                pass
+        result, dir = self.map.get_frontier_target()
+        if result is not None:
+            self.add_bearing(dir)
         return result, dir
 
     def execute_algo_move(self, sense, ir, num_move=1):
@@ -441,6 +543,7 @@ class ExplorationAlgo:
             logging.debug("IR no obstacle in the middle")
 
     def go_home(self):
+        self.finish_streamed()
         self.handler.robot.update_map = False
         self.movements.clear()
         self.movements = self.path_finder.find_fastest_path(diag=False, delay=0, goalX=1, goalY=18, waypointX=2,
@@ -450,6 +553,84 @@ class ExplorationAlgo:
         logging.debug("Going Home from {}, len movements: {}".format(self.handler.robot.get_location(), len(self.movements)))
         self.status = STATUS.RETURN_HOME
 
+    # the plan in the moves move_and_sense makes it in, as (movement, steps, x, y, bearing) with the pose before
+    # each move, and whether every pose on the way is still traversable on the current map
+    def plan_moves(self):
+        x, y = self.handler.robot.get_location()
+        bearing = self.handler.robot.bearing
+        moves = []
+        clear = True
+
+        i = 0
+        while i < len(self.movements):
+            movement = self.movements[i]
+            steps = 1
+            if movement == MOVEMENT.FORWARD and self.optimized and [x, y] != list(self.start_pos):
+                while steps < 3 and i + steps < len(self.movements) and self.movements[i + steps] == MOVEMENT.FORWARD:
+                    steps += 1
+            moves.append((movement, steps, x, y, bearing))
+            i += steps
+
+            if movement == MOVEMENT.FORWARD:
+                for _ in range(steps):
+                    x, y = self.simulate_move(x, y, bearing)
+                    if not (self.map.valid_range(y, x) and self.map.is_traversable(x, y)):
+                        clear = False
+            elif movement == MOVEMENT.LEFT:
+                bearing = Bearing.prev_bearing(bearing)
+            elif movement == MOVEMENT.RIGHT:
+                bearing = Bearing.next_bearing(bearing)
+            else:
+                # spelunking and going home never plan diagonals, nothing after one is streamed
+                return moves[:-1], clear
+
+        return moves, clear
+
+    # spelunking and going home follow a committed plan, so the real robot is sent the next moves before the
+    # reply to the current one comes back. After every reply the rest of the plan is checked against the map,
+    # an obstacle on the way stops the streaming and the plan is made again once the moves already sent are done.
+    def stream_plan(self):
+        if not self.handler.robot.streams or len(self.movements) == 0:
+            return
+
+        moves, clear = self.plan_moves()
+        if clear:
+            self.handler.robot.stream(self.get_streamable(moves))
+            return
+
+        logging.debug("[EXPLORATION] Obstacle on the planned path, replanning")
+        self.finish_streamed()
+        self.movements.clear()
+        if self.status == STATUS.RETURN_HOME:
+            self.go_home()
+
+    # the moves of the plan which can be sent ahead: the next one, which is made now anyway, and those after it
+    # up to the first one passing over a cell a reading could still turn into an obstacle. Exploration may end
+    # once the robot is back at the start, so nothing after the move arriving there is sent either. Moves
+    # already sent are made whatever the map shows by then.
+    def get_streamable(self, moves):
+        for i, (movement, steps, x, y, bearing) in enumerate(moves):
+            if movement != MOVEMENT.FORWARD:
+                continue
+            for _ in range(steps):
+                x, y = self.simulate_move(x, y, bearing)
+                if i > 0 and not self.map.is_confirmed_free(x, y):
+                    return moves[:i]
+            if self.return_home and (x, y) == (1, 18):
+                return moves[:i + 1]
+        return moves
+
+    # makes the moves already sent to the robot, the plan after them is dropped
+    def finish_streamed(self):
+        in_flight = self.handler.robot.in_flight()
+        if in_flight == 0:
+            return
+
+        moves, _ = self.plan_moves()
+        self.movements = self.movements[:sum(steps for _, steps, _, _, _ in moves[:in_flight])]
+        for _ in range(in_flight):
+            self.move_and_sense()
+
     def add_bearing(self, dir):
         cur_dir = self.handler.robot.bearing
         if self.movements!= None and len(self.movements) > 0:
@@ -511,7 +692,7 @@ class ExplorationAlgo:
         else:
             logging.debug("Warning invalid direction")
 
-    def set_status(self, do_img_rec, partial_ir):
+    def set_status(self, do_img_rec, partial_ir, information_gain=False):
         if do_img_rec:
             self.status = STATUS.IMAGE_REC
             self.max_move = 3
@@ -519,6 +700,9 @@ class ExplorationAlgo:
             if partial_ir:
                 self.partial_ir = True
             # self.set_optimized(True)
+        elif information_gain:
+            self.status = STATUS.INFORMATION_GAIN
+            self.max_move = 999
         else:
             self.status = STATUS.LEFT_WALL_HUGGING
             self.max_move = 999
@@ -529,6 +713,9 @@ class ExplorationAlgo:
     def set_optimized(self, opt):
         self.optimized = opt
 
+    def set_path_finder(self, path_finder):
+        self.path_finder = path_finder
+
     def simulate_move(self, robot_x, robot_y, robot_bearing):
         if robot_bearing == Bearing.NORTH:
             robot_y -= 1
@@ -0,0 +1,192 @@
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from constants import Bearing
+from handler import Handler
+from utils import convert_to_cm_short, convert_to_cm_long
+
+# commands of a fastest path string, e.g. gf03r83h02
+FASTEST_PATH_COMMAND_LENGTH = 3
+
+
+# Stand-in for the RPi, so comms.py and real_robot.py can be run without the hardware. It listens where
+# RealRobot.connect dials, drives a SimulatedRobot over a map_sim arena with the commands it receives and
+# answers every grid step and turn with a sensor line in centimetres, in the order RealRobot.receive reads
+# them: left back, left front, front left, front middle, front right, right. Moves along a diagonal are not
+# answered, RealRobot.move_diag does not wait for a reply.
+# Android commands can be injected at fixed times after the robot connects.
+class FakeRPi:
+    def __init__(self, descriptor=None, latency=0, jitter=0, loss=0, android=None, seed=None):
+        self.handler = Handler()
+        if descriptor:
+            self.handler.map.decode_map_descriptor(descriptor)
+        self.robot = self.handler.robot
+
+        # seconds before a reply is written, plus up to jitter more, and the fraction of replies never sent
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        # (seconds after connecting, command)
+        self.android = android if android is not None else []
+
+        self.writer = None
+        self.last_reply = 0
+        self.stats = dict(commands=0, replies=0, lost=0, map_messages=0, images=0, bytes_in=0, bytes_out=0)
+        self.connected_at = None
+
+    async def handle(self, reader, writer):
+        if self.writer is not None:
+            logging.info("Already serving a robot, refusing the new connection")
+            writer.close()
+            return
+
+        self.writer = writer
+        self.connected_at = time.time()
+        self.robot.reset()
+        logging.info("Robot connected")
+
+        loop = asyncio.get_running_loop()
+        for delay, command in self.android:
+            loop.call_later(delay, self.write, command + '\n')
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            self.stats['bytes_in'] += len(line)
+            self.execute(line.decode('cp1252').rstrip('\r\n'))
+
+        self.writer = None
+        self.log_stats()
+
+    def execute(self, command):
+        if not command:
+            return
+
+        if command[:2] in ('M{', 'D{'):
+            self.stats['map_messages'] += 1
+            return
+
+        self.stats['commands'] += 1
+        logging.debug("[FAKE RPI] " + command)
+
+        if command[0] == 'P':
+            self.stats['images'] += 1
+        elif command[0] == 'g':
+            self.execute_fastest_path(command[1:])
+        elif command[0] == 'f' and Bearing.is_diag_bearing(self.robot.bearing):
+            self.forward(int(command[1:]))
+        elif command[0] == 'f':
+            for _ in range(int(command[1:])):
+                self.forward(1)
+                self.reply_sensors()
+        elif command in ('l83', 'r83', 'l33', 'r33'):
+            self.turn(command)
+            self.reply_sensors()
+        elif command == 's':
+            self.reply_sensors()
+        # calibration (c) and the end of exploration (N) need no reply
+
+    def forward(self, steps):
+        if Bearing.is_diag_bearing(self.robot.bearing):
+            self.robot.move_diag(steps=steps)
+        else:
+            self.robot.move(sense=False, ir=False, steps=steps)
+
+    def turn(self, command):
+        if command == 'l83':
+            self.robot.left(sense=False, ir=False)
+        elif command == 'r83':
+            self.robot.right(sense=False, ir=False)
+        elif command == 'l33':
+            self.robot.left_diag()
+        else:
+            self.robot.right_diag()
+
+    # the arduino runs the whole path without reporting back
+    def execute_fastest_path(self, commands):
+        for i in range(0, len(commands), FASTEST_PATH_COMMAND_LENGTH):
+            command = commands[i:i + FASTEST_PATH_COMMAND_LENGTH]
+            if command[0] in ('f', 'h'):
+                self.forward(int(command[1:]))
+            else:
+                self.turn(command)
+
+    def reply_sensors(self):
+        front_left, front_middle, front_right, left_front, left_middle, right = self.robot.receive()
+        line = "{} {} {} {} {} {}\n".format(convert_to_cm_short(left_middle), convert_to_cm_short(left_front),
+                                            convert_to_cm_short(front_left), convert_to_cm_short(front_middle),
+                                            convert_to_cm_short(front_right), convert_to_cm_long(right))
+
+        if self.random.random() < self.loss:
+            self.stats['lost'] += 1
+            return
+
+        # replies keep their order like on the serial link, jitter only ever delays them. Timers due at the
+        # same time may run in any order, so every reply is due strictly after the previous one.
+        loop = asyncio.get_running_loop()
+        reply_at = max(loop.time() + self.latency + self.random.uniform(0, self.jitter), self.last_reply + 1e-6)
+        self.last_reply = reply_at
+        self.stats['replies'] += 1
+        loop.call_at(reply_at, self.write, line)
+
+    def write(self, msg):
+        if self.writer is not None:
+            self.stats['bytes_out'] += len(msg)
+            self.writer.write(str.encode(msg))
+
+    def log_stats(self):
+        elapsed = time.time() - self.connected_at
+        logging.info("Robot disconnected after {:0.2f} second, {:0.1f} commands per second: {}".format(
+            elapsed, self.stats['commands'] / elapsed if elapsed > 0 else 0, self.stats))
+
+
+def parse_android(text):
+    delay, command = text.split(':', 1)
+    return float(delay), command
+
+
+async def serve(fake_rpi, host, port):
+    server = await asyncio.start_server(fake_rpi.handle, host, port)
+    logging.info("Fake RPi listening on {}:{}".format(host, port))
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='MDP Fake RPi, answers the robot line protocol from a simulated arena'
+    )
+    parser.add_argument("map", nargs='?', default=None,
+                        help="Map descriptor file for the arena, the default map_sim if not given")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("-p", "--port", type=int, default=1273)
+    parser.add_argument("-l", "--latency", type=float, default=0, help="Reply latency in milliseconds")
+    parser.add_argument("-j", "--jitter", type=float, default=0, help="Extra random reply latency in milliseconds")
+    parser.add_argument("--loss", type=float, default=0, help="Fraction of sensor replies that are lost")
+    parser.add_argument("-a", "--android", type=parse_android, nargs='*', default=[], metavar='SECONDS:COMMAND',
+                        help="Android commands to send after the robot connects, e.g. 1:ES|")
+    parser.add_argument("-s", "--seed", type=int, default=None)
+    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+
+    args = parser.parse_args()
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    descriptor = None
+    if args.map:
+        with open(args.map, "r") as f:
+            descriptor = f.readline()
+
+    fake_rpi = FakeRPi(descriptor, latency=args.latency / 1000, jitter=args.jitter / 1000, loss=args.loss,
+                       android=args.android, seed=args.seed)
+    try:
+        asyncio.run(serve(fake_rpi, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -1,20 +1,90 @@
+import heapq
 import time
-from copy import deepcopy
 import config
-from constants import Bearing, MOVEMENT
-from map import *
+from constants import Bearing, MOVEMENT, COST
 import logging
 
-INFINITE_COST = 9999
-MOVE_COST = 10
-MOVE_COST_DIAG = 15
-TURN_COST = 20
-TURN_COST_DIAG = 10
-WAYPONT_PENALTY = 1000
+# scores of find_best_goal closer than this are a tie, sums of the same values taken in another order differ
+# in the last bits
+SCORE_TOLERANCE = 1e-9
+
+# cell offset of a single forward move for each bearing
+BEARING_OFFSETS = {
+    Bearing.NORTH: (0, -1),
+    Bearing.NORTH_EAST: (1, -1),
+    Bearing.EAST: (1, 0),
+    Bearing.SOUTH_EAST: (1, 1),
+    Bearing.SOUTH: (0, 1),
+    Bearing.SOUTH_WEST: (-1, 1),
+    Bearing.WEST: (-1, 0),
+    Bearing.NORTH_WEST: (-1, -1)
+}
+
+
+# turns in place from one bearing to another, indexed by the clockwise difference between them in 45 degrees
+TURN_MOVEMENTS = [
+    [],
+    [MOVEMENT.RIGHT_DIAG],
+    [MOVEMENT.RIGHT],
+    [MOVEMENT.RIGHT_DIAG, MOVEMENT.RIGHT],
+    [MOVEMENT.RIGHT, MOVEMENT.RIGHT],
+    [MOVEMENT.LEFT_DIAG, MOVEMENT.LEFT],
+    [MOVEMENT.LEFT],
+    [MOVEMENT.LEFT_DIAG]
+]
+
+# movements taking the robot facing from_bearing into the next cell along to_bearing
+STEP_MOVEMENTS = {
+    (from_bearing, to_bearing): TURN_MOVEMENTS[(to_bearing - from_bearing) % 8] +
+                                [MOVEMENT.FORWARD_DIAG if Bearing.is_diag_bearing(to_bearing) else MOVEMENT.FORWARD]
+    for from_bearing in Bearing for to_bearing in Bearing
+}
+
+TURN_COMMANDS = {
+    MOVEMENT.LEFT: 'l83',
+    MOVEMENT.RIGHT: 'r83',
+    MOVEMENT.LEFT_DIAG: 'l33',
+    MOVEMENT.RIGHT_DIAG: 'r33'
+}
+
+
+def sign(value):
+    return (value > 0) - (value < 0)
+
+
+# arduino commands for a list of movements, consecutive forward moves are merged into a single command
+def compress_movements(movements):
+    commands = []
+    previous = None
+    count = 0
+
+    for movement in movements:
+        if movement == previous and movement in (MOVEMENT.FORWARD, MOVEMENT.FORWARD_DIAG):
+            count += 1
+            continue
+
+        if previous == MOVEMENT.FORWARD:
+            commands.append('f{:0>2d}'.format(count))
+        elif previous == MOVEMENT.FORWARD_DIAG:
+            commands.append('h{:0>2d}'.format(count))
+
+        if movement in TURN_COMMANDS:
+            commands.append(TURN_COMMANDS[movement])
+            previous = None
+        else:
+            previous = movement
+            count = 1
+
+    if previous == MOVEMENT.FORWARD:
+        commands.append('f{:0>2d}'.format(count))
+    elif previous == MOVEMENT.FORWARD_DIAG:
+        commands.append('h{:0>2d}'.format(count))
+
+    return commands
 
 
 class Node():
-    def __init__(self, x, y, parent=None, dir=None, g=INFINITE_COST, h=INFINITE_COST):
+    def __init__(self, x, y, parent=None, dir=None, g=COST.INFINITE_COST, h=COST.INFINITE_COST):
         self.parent = parent
         self.x = x
         self.y = y
@@ -33,45 +103,84 @@ class FastestPathAlgo():
     def __init__(self, map, robot, handler):
         self.map = map
         self.handler = handler
+        # search state is (x, y, bearing); the open list is a binary heap of (f, h, seq, node) entries and
+        # g_costs holds the best known g of every generated state, so stale heap entries are skipped when popped
         self.open_list = []
-        self.closed_list = []
+        self.g_costs = {}
+        self.closed_list = set()
+        self.seq = 0
+        self.expanded_nodes = 0
+        # total time spent planning in find_fastest_path, not counting the execution of the path
+        self.planning_time = 0
+        self.planning_calls = 0
+        self.reached_node = None
+        self.path = []
+        self.movements = []
+        self.commands = []
         self.waypoint = None
         self.start_node = None
         self.destination_node = None
         self.goal_node = None
         self.diag = False
         self.delay = 10
+        self.turn_heuristic = {
+            False: self.build_turn_heuristic(diag=False),
+            True: self.build_turn_heuristic(diag=True)
+        }
 
     def check_valid_open(self, node):
-        # logging.debug("Node ({}, {}) : {} {} {} {}".format(node.x, node.y, self.map.valid_range(node.y, node.x) , \
-        #                     map_virtual[node.y][node.x] , map_is_explored[node.y][node.x] == 1, self.map.is_virtual_wall(node.x, node.y)))
-        return self.map.valid_range(node.y, node.x) and self.map.is_valid_open(node.x,
-                                                                               node.y) and not self.map.is_virtual_wall(
-            node.x, node.y)
-
-    def best_first(self):
-        min_cost = INFINITE_COST
-        best_node_index = -1
-
-        for i in range(len(self.open_list)):
-            f = self.open_list[i].g + self.open_list[i].h
-            if (f < min_cost):
-                min_cost = f
-                best_node_index = i
-        return best_node_index
+        return self.map.valid_range(node.y, node.x) and self.map.is_traversable(node.x, node.y)
 
-    def cost_h(self, node):
-        turn_cost = 0
-        move_cost = abs(node.x - self.goal_node.x) + abs(node.y - self.goal_node.y)
+    def push_open(self, node):
+        self.g_costs[(node.x, node.y, node.dir)] = node.g
+        heapq.heappush(self.open_list, (node.g + node.h, node.h, self.seq, node))
+        self.seq += 1
 
-        if (move_cost == 0):
-            return move_cost
+    def clear_lists(self):
+        self.open_list.clear()
+        self.g_costs.clear()
+        self.closed_list.clear()
+        self.seq = 0
+
+    # minimum turning cost before the robot can make progress towards a goal lying in direction (dx, dy).
+    # The robot has to face at least one bearing pointing towards the goal, and without diagonals it
+    # has to face both an x and a y bearing when the goal is off-axis.
+    def turn_lower_bound(self, bearing, dx, dy, diag):
+        towards_goal = [b for b, offset in BEARING_OFFSETS.items()
+                        if offset[0] * dx + offset[1] * dy > 0 and (diag or not Bearing.is_diag_bearing(b))]
+        if len(towards_goal) == 0:
+            return 0
+
+        turn_cost = min(self.get_turn_cost(bearing, b) for b in towards_goal)
+        if not diag and dx != 0 and dy != 0:
+            turn_cost += COST.TURN_COST
+        return turn_cost
+
+    # turn_lower_bound only depends on the bearing, the signs of dx and dy and which of them is larger,
+    # so it is tabulated once per mode
+    def build_turn_heuristic(self, diag):
+        table = {}
+        for bearing in Bearing:
+            for sx in (-1, 0, 1):
+                for sy in (-1, 0, 1):
+                    for larger in (-1, 0, 1):
+                        dx = sx * (2 if larger > 0 else 1)
+                        dy = sy * (2 if larger < 0 else 1)
+                        table[(bearing, sx, sy, larger)] = self.turn_lower_bound(bearing, dx, dy, diag)
+        return table
 
-        if (node.x != self.goal_node.x and node.y != self.goal_node.y):
-            turn_cost = TURN_COST
+    def cost_h(self, node):
+        dx = self.goal_node.x - node.x
+        dy = self.goal_node.y - node.y
+        abs_dx = abs(dx)
+        abs_dy = abs(dy)
 
-        return move_cost * MOVE_COST + turn_cost
+        if self.diag:
+            move_cost = min(abs_dx, abs_dy) * COST.MOVE_COST_DIAG + abs(abs_dx - abs_dy) * COST.MOVE_COST
+        else:
+            move_cost = (abs_dx + abs_dy) * COST.MOVE_COST
 
+        return move_cost + self.turn_heuristic[self.diag][(node.dir, sign(dx), sign(dy), sign(abs_dx - abs_dy))]
 
     def get_turn_cost(self, from_dir, to_dir):
         if (from_dir == to_dir):
@@ -80,7 +189,7 @@ class FastestPathAlgo():
         prev_bearing = Bearing.prev_bearing_diag(from_dir)
         next_bearing = Bearing.next_bearing_diag(from_dir)
 
-        turn_costs = [TURN_COST_DIAG, TURN_COST, 3 * TURN_COST_DIAG, 2 * TURN_COST]
+        turn_costs = [COST.TURN_COST_DIAG, COST.TURN_COST, 3 * COST.TURN_COST_DIAG, 2 * COST.TURN_COST]
 
         for i in range(4):
 
@@ -90,58 +199,128 @@ class FastestPathAlgo():
             prev_bearing = Bearing.prev_bearing_diag(prev_bearing)
             next_bearing = Bearing.next_bearing_diag(next_bearing)
 
-    def get_target_dir(self, from_node, to_node):
-        if self.diag:
-            if to_node.x - from_node.x > 0 and to_node.y - from_node.y < 0:
-                return Bearing.NORTH_EAST
-            elif to_node.x - from_node.x > 0 and to_node.y - from_node.y > 0:
-                return Bearing.SOUTH_EAST
-            elif to_node.x - from_node.x < 0 and to_node.y - from_node.y > 0:
-                return Bearing.SOUTH_WEST
-            elif to_node.x - from_node.x < 0 and to_node.y - from_node.y < 0:
-                return Bearing.NORTH_WEST
-
-        if (to_node.x - from_node.x > 0):
-            return Bearing.EAST
-        elif (to_node.x - from_node.x < 0):
-            return Bearing.WEST
-        elif (to_node.y - from_node.y > 0):
-            return Bearing.SOUTH
-        return Bearing.NORTH
-
-    def cost_g(self, current_dir, next_dir):
-        turn_cost = self.get_turn_cost(current_dir, next_dir)
-        if Bearing.is_diag_bearing(next_dir):
-            return MOVE_COST_DIAG + turn_cost
-        return MOVE_COST + turn_cost
-
-    def create_virtual_wall(self):
-        try:
-            for i in range(config.map_size['height']):
-                for j in range(config.map_size['width']):
-
-                    if self.map.is_physical_wall(j, i) or not self.map.is_explored(j, i):
-                        self.map.set_virtual_wall_around(j, i)
-
-                    if (map_virtual[i][j] == 3):
-                        map_virtual[i][j] = 0
-
-            self.map.set_virtual_wall_border()
-        except IndexError:
-            pass
-
-    def restore_map(self):
-        for i in range(config.map_size['height']):
-            for j in range(config.map_size['width']):
-                if (map_virtual[i][j] == 3 or map_virtual[i][j] == 2):
-                    map_virtual[i][j] = 0
+    # transitions out of a state: a forward move keeps the bearing, a turn keeps the cell
+    def get_neighbours(self, node):
+        neighbours = []
+        bearing = node.dir
+
+        if self.diag or not Bearing.is_diag_bearing(bearing):
+            offset = BEARING_OFFSETS[bearing]
+            move_cost = COST.MOVE_COST_DIAG if Bearing.is_diag_bearing(bearing) else COST.MOVE_COST
+            neighbour = Node(node.x + offset[0], node.y + offset[1], node, dir=bearing, g=node.g + move_cost)
+            if self.check_valid_open(neighbour):
+                neighbours.append(neighbour)
+
+        neighbours.append(Node(node.x, node.y, node, dir=Bearing.next_bearing(bearing), g=node.g + COST.TURN_COST))
+        neighbours.append(Node(node.x, node.y, node, dir=Bearing.prev_bearing(bearing), g=node.g + COST.TURN_COST))
+
+        # a robot left on a diagonal bearing can still turn back onto the grid without diagonals
+        if self.diag or Bearing.is_diag_bearing(bearing):
+            neighbours.append(Node(node.x, node.y, node, dir=Bearing.next_bearing_diag(bearing),
+                                   g=node.g + COST.TURN_COST_DIAG))
+            neighbours.append(Node(node.x, node.y, node, dir=Bearing.prev_bearing_diag(bearing),
+                                   g=node.g + COST.TURN_COST_DIAG))
+
+        return neighbours
+
+    # Dijkstra from the robot without diagonals, yields every reachable state in order of travel cost as the
+    # node it is reached by, starting with the state the robot is in. Stopping early leaves the search lists
+    # for the next sweep or search to clear.
+    def sweep(self):
+        self.clear_lists()
+        self.diag = False
+        self.push_open(Node(self.handler.robot.x, self.handler.robot.y, dir=self.handler.robot.bearing, g=0, h=0))
+
+        while len(self.open_list) > 0:
+            _, _, _, current_node = heapq.heappop(self.open_list)
+            current_state = (current_node.x, current_node.y, current_node.dir)
+
+            if current_state in self.closed_list or current_node.g > self.g_costs[current_state]:
+                continue
+
+            self.closed_list.add(current_state)
+            self.expanded_nodes += 1
+            yield current_node
+
+            for neighbour in self.get_neighbours(current_node):
+                neighbour_state = (neighbour.x, neighbour.y, neighbour.dir)
+                known_g = self.g_costs.get(neighbour_state)
+
+                if known_g is not None and neighbour.g >= known_g:
+                    continue
+
+                neighbour.h = 0
+                self.push_open(neighbour)
+
+    # movements from the robot to a node of the sweep, turns in place at the end included
+    def get_sweep_movements(self, node):
+        # get_fastest_path_movements ends with a move, the turns after it are added here
+        arrival_node = node
+        while arrival_node.parent != None and arrival_node.parent == arrival_node:
+            arrival_node = arrival_node.parent
+        self.get_fastest_path_movements(arrival_node)
+        self.movements += TURN_MOVEMENTS[(node.dir - arrival_node.dir) % 8]
+        self.commands = compress_movements(self.movements)
+        return self.movements
+
+    # a single sweep which stops at the cheapest of the goal states, given as (x, y, bearing). Returns the goal
+    # state reached and the movements to it, or (None, None) when none can be reached. The state the robot is
+    # in is never a goal.
+    def find_nearest_goal(self, goals):
+        if len(goals) == 0:
+            return None, None
+
+        start = time.time()
+        self.planning_calls += 1
+        goal_node = None
+
+        for node in self.sweep():
+            if node.g > 0 and (node.x, node.y, node.dir) in goals:
+                goal_node = node
+                break
+
+        return self.finish_sweep(goal_node, start)
+
+    # a full sweep which scores every state by score(x, y, bearing, g), None leaving the state out, and
+    # returns the state with the highest score and the movements to it like find_nearest_goal. Scores within
+    # SCORE_TOLERANCE tie, ties go to the cheaper state and then to the lowest (y, x, bearing).
+    def find_best_goal(self, score):
+        start = time.time()
+        self.planning_calls += 1
+        goal_node = None
+        best = None
+
+        for node in self.sweep():
+            if node.g == 0:
+                continue
+            value = score(node.x, node.y, node.dir, node.g)
+            if value is None:
+                continue
+            if best is None or value > best + SCORE_TOLERANCE or (
+                    value >= best - SCORE_TOLERANCE and
+                    (node.g, node.y, node.x, node.dir) < (goal_node.g, goal_node.y, goal_node.x, goal_node.dir)):
+                goal_node = node
+                best = value
+
+        return self.finish_sweep(goal_node, start)
+
+    def finish_sweep(self, goal_node, start):
+        result = None, None
+        if goal_node is not None:
+            result = (goal_node.x, goal_node.y, goal_node.dir), self.get_sweep_movements(goal_node)
+        else:
+            logging.debug("[FASTEST PATH] No goal reachable")
+
+        self.clear_lists()
+        self.planning_time += time.time() - start
+        return result
 
     def find_fastest_path(self, diag, delay, goalX, goalY, waypointX, waypointY, startX=1,
                           startY=config.map_size['height'] - 2, sim=True):
 
-        self.create_virtual_wall()
-        self.open_list.clear()
-        self.closed_list.clear()
+        start = time.time()
+        self.planning_calls += 1
+        self.clear_lists()
 
         self.curDir = self.handler.robot.bearing
         self.diag = diag
@@ -155,9 +334,10 @@ class FastestPathAlgo():
 
         self.start_node.g = 0
         self.start_node.h = self.cost_h(self.start_node)
-        self.open_list.append(self.start_node)
+        self.push_open(self.start_node)
 
         path_found_wp = False
+        waypoint_goal_node = None
         if self.waypoint.x > 0 and self.waypoint.x < config.map_size[
             'width'] - 1 and self.waypoint.y > 0 and self.waypoint.y < config.map_size['height'] - 1:
             path_found_wp = self.run()
@@ -165,55 +345,52 @@ class FastestPathAlgo():
                 logging.debug("[FASTEST PATH] No path found from start to waypoint")
 
             else:
-                self.start_node = self.closed_list.pop(len(self.closed_list) - 1)
+                self.start_node = self.reached_node
                 self.goal_node = self.destination_node
                 self.start_node.h = self.cost_h(self.start_node)
-                self.open_list.clear()
-                self.closed_list.clear()
-                self.open_list.append(self.start_node)
+                self.clear_lists()
+                self.push_open(self.start_node)
 
                 path_found_wp = self.run()
 
                 if (not path_found_wp):
                     logging.debug("[FASTEST PATH] No path found from waypoint to goal")
+                else:
+                    waypoint_goal_node = self.reached_node
         else:
             logging.debug("[FASTEST PATH] Waypoints out of bound")
 
-        self.temp_path = deepcopy(self.closed_list)
-        self.closed_list.clear()
-        self.open_list.clear()
+        self.clear_lists()
 
         self.start_node = self.initial_node
         self.goal_node = self.destination_node
         self.start_node.g = 0
         self.start_node.h = self.cost_h(self.start_node)
-        self.open_list.append(self.start_node)
+        self.push_open(self.start_node)
 
         path_found_fp = self.run()
         if (not path_found_fp):
             logging.debug("[FASTEST PATH] No path found from start to goal")
+            self.planning_time += time.time() - start
             return
 
         if path_found_wp and path_found_fp:
-            if self.temp_path[len(self.temp_path) - 1].g - self.closed_list[
-                len(self.closed_list) - 1].g > WAYPONT_PENALTY:
-                self.fastest_path_goal_node = self.closed_list[len(self.closed_list) - 1]
+            if waypoint_goal_node.g - self.reached_node.g > COST.WAYPONT_PENALTY:
+                self.fastest_path_goal_node = self.reached_node
             else:
-                self.fastest_path_goal_node = self.temp_path[len(self.temp_path) - 1]
-        elif path_found_fp:
-            self.fastest_path_goal_node = self.closed_list[len(self.closed_list) - 1]
+                self.fastest_path_goal_node = waypoint_goal_node
         else:
-            self.fastest_path_goal_node = self.temp_path[len(self.temp_path) - 1]
-
-        self.restore_map()
+            self.fastest_path_goal_node = self.reached_node
 
         if sim:
             self.get_fastest_path_movements(self.fastest_path_goal_node)
+            self.planning_time += time.time() - start
             # logging.debug("[FASTEST PATH] EXECUTING FASTEST PATH")
             self.handler.robot.execute_fastest_path(self.movements)
             # return
         else:
             self.get_fastest_path_movements(self.fastest_path_goal_node)
+            self.planning_time += time.time() - start
             return self.movements
 
     def run(self):
@@ -223,59 +400,35 @@ class FastestPathAlgo():
 
         start = time.time()
 
-        # logging.debug("open list: ", self.open_list)
         while len(self.open_list) > 0:
 
-            best_index = self.best_first()
+            _, _, _, current_node = heapq.heappop(self.open_list)
+            current_state = (current_node.x, current_node.y, current_node.dir)
 
-            current_node = self.open_list.pop(best_index)
-            self.closed_list.append(current_node)
-            curDir = current_node.dir
+            # stale entry left behind by a cheaper path to the same state
+            if current_state in self.closed_list or current_node.g > self.g_costs[current_state]:
+                continue
+
+            self.closed_list.add(current_state)
+            self.expanded_nodes += 1
 
             if (current_node == self.goal_node):
+                self.reached_node = current_node
                 end = time.time()
                 logging.debug("[FASTEST PATH] Fastest path found in {:0.5f} second".format(end - start))
                 return True
 
-            # logging.debug("Open: ({} , {}) g = {} h = {} f = {} dir = {}".format(current_node.x, current_node.y, current_node.g,
-            #                                                              current_node.h,
-            #                                                              current_node.g + current_node.h,
-            #                                                              current_node.dir))
-
-            if self.diag:
-                neighbour_positions = [(0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1)]
-            else:
-                neighbour_positions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
-            for neighbour_position in neighbour_positions:
-
-                neighbour = Node(current_node.x + neighbour_position[0], current_node.y + neighbour_position[1],
-                                 current_node)
-                # logging.debug("children: {}  {} ".format(neighbour.x, neighbour.y))
-                if (not self.check_valid_open(neighbour)):
-                    # logging.debug("Invalid children: {}  {} ".format(neighbour.x, neighbour.y))
-                    continue
+            for neighbour in self.get_neighbours(current_node):
+                neighbour_state = (neighbour.x, neighbour.y, neighbour.dir)
+                known_g = self.g_costs.get(neighbour_state)
 
-                if (neighbour in self.closed_list):
+                if known_g is not None and neighbour.g >= known_g:
                     continue
 
-                dir = self.get_target_dir(current_node, neighbour)
-                if (neighbour not in self.open_list):
-                    neighbour.dir = dir
-                    neighbour.g = self.cost_g(dir, curDir) + current_node.g
-                    # logging.debug("neighbour g: {} , parent g: {}".format( self.cost_g(current_node, neighbour, dir) , current_node.g))
-                    neighbour.h = self.cost_h(neighbour)
-                    self.open_list.append(neighbour)
-
-                else:
-                    g_cost = self.cost_g(dir, curDir) + current_node.g
-                    h_cost = self.cost_h(neighbour)
-                    f_cost = g_cost + h_cost
-                    index = self.open_list.index(neighbour)
-                    if (f_cost < self.open_list[index].g + self.open_list[index].h):
-                        self.open_list[index].dir = dir
-                        self.open_list[index].g = g_cost
-                        self.open_list[index].h = h_cost
-                        self.open_list[index].parent = current_node
+                # reopen the state if it was already closed with a worse cost
+                self.closed_list.discard(neighbour_state)
+                neighbour.h = self.cost_h(neighbour)
+                self.push_open(neighbour)
 
         end = time.time()
         logging.debug("[FASTEST PATH] No path found in {:0.2f}".format(end - start))
@@ -285,223 +438,21 @@ class FastestPathAlgo():
     def get_fastest_path_movements(self, goal_node):
         node = goal_node
         self.path = []
-        self.movements = []
+        steps = []
+        # walked from the goal back to the start, both lists are reversed once at the end
         while node != None:
-            # map_virtual[node.y][node.x] = 3
-            self.path.insert(0, node)
+            self.path.append(node)
+            to_dir = node.dir
             node = node.parent
+            # turns in place are folded into the movement towards the next cell
+            while node != None and node.parent != None and node.parent.x == node.x and node.parent.y == node.y:
+                node = node.parent
             if (node != None):
-                self.get_target_movement(node.dir, self.path[0].dir)
+                steps.append(STEP_MOVEMENTS[(node.dir, to_dir)])
 
-        # for y in range(config.map_size['height']):
-        #     logging.debug((map_virtual)[y])
+        self.path.reverse()
+        steps.reverse()
+        self.movements = [movement for step in steps for movement in step]
+        self.commands = compress_movements(self.movements)
 
         logging.debug("[FASTEST PATH] Total cost: {}".format(goal_node.g))
-        #
-        # for m in self.movements:
-        #     logging.debug(m)
-
-    # def execute_fastest_path(self):
-    #     num_move = 1
-    #     movement = self.movements.pop(0)
-    #     if movement == MOVEMENT.FORWARD or movement == MOVEMENT.FORWARD_DIAG:
-    #         while len(self.movements) > 0:
-    #             if self.movements[0] == movement:
-    #                 self.movements.pop(0)
-    #                 num_move += 1
-    #             else:
-    #                 break
-    #
-    #     if(movement == MOVEMENT.LEFT):
-    #         self.handler.left(sense = False, ir = False)
-    #     elif(movement == MOVEMENT.RIGHT):
-    #         self.handler.right(sense = False, ir = False)
-    #     elif (movement == MOVEMENT.LEFT_DIAG):
-    #         self.handler.left_diag()
-    #     elif (movement == MOVEMENT.RIGHT_DIAG):
-    #         self.handler.right_diag()
-    #     elif (movement == MOVEMENT.FORWARD_DIAG):
-    #         self.handler.move_diag(steps=num_move)
-    #     else:
-    #         self.handler.move(steps = num_move, sense = False, ir = False)
-    #
-    #     if len(self.movements) > 0 :
-    #         self.handler.simulator.job = self.handler.simulator.root.after(self.delay, self.execute_fastest_path)
-
-    def get_target_movement(self, from_dir, to_dir):
-        if Bearing.is_diag_bearing(to_dir):
-            self.movements.insert(0, MOVEMENT.FORWARD_DIAG)
-        else:
-            self.movements.insert(0, MOVEMENT.FORWARD)
-
-        if from_dir == to_dir:
-            return
-
-        if from_dir == Bearing.NORTH:
-            self.get_target_movement_north(to_dir)
-        elif from_dir == Bearing.NORTH_EAST:
-            self.get_target_movement_northeast(to_dir)
-        elif from_dir == Bearing.EAST:
-            self.get_target_movement_east(to_dir)
-        elif from_dir == Bearing.SOUTH_EAST:
-            self.get_target_movement_southeast(to_dir)
-        elif from_dir == Bearing.SOUTH:
-            self.get_target_movement_south(to_dir)
-        elif from_dir == Bearing.SOUTH_WEST:
-            self.get_target_movement_southwest(to_dir)
-        elif from_dir == Bearing.WEST:
-            self.get_target_movement_west(to_dir)
-        else:
-            self.get_target_movement_northwest(to_dir)
-
-    def get_target_movement_north(self, to_dir):
-        if to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.NORTH_WEST:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_east(self, to_dir):
-        if to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_south(self, to_dir):
-        if to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.NORTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_west(self, to_dir):
-        if to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.NORTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_northeast(self, to_dir):
-        if to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.NORTH_WEST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_southeast(self, to_dir):
-        if to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.NORTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_southwest(self, to_dir):
-        if to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.NORTH_WEST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
-
-    def get_target_movement_northwest(self, to_dir):
-        if to_dir == Bearing.NORTH:
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.WEST:
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.NORTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-        elif to_dir == Bearing.SOUTH_WEST:
-            self.movements.insert(0, MOVEMENT.LEFT)
-        elif to_dir == Bearing.EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT_DIAG)
-        elif to_dir == Bearing.SOUTH:
-            self.movements.insert(0, MOVEMENT.LEFT)
-            self.movements.insert(0, MOVEMENT.LEFT_DIAG)
-        elif to_dir == Bearing.SOUTH_EAST:
-            self.movements.insert(0, MOVEMENT.RIGHT)
-            self.movements.insert(0, MOVEMENT.RIGHT)
@@ -1,21 +1,81 @@
+from collections import deque
+
+import numpy as np
+
 import config
 import simulated_robot
 import real_robot
 from core import Core
 from map import Map
-from constants import Bearing
+from map_publisher import MapPublisher
+from sensor_model import SensorModel
+
+# weight of a real sensor reading by the distance of the cell from the sensor, the last one for anything further
+OBSTACLE_WEIGHTS = np.array([1000, 500, 10, 10, 1])
 
 
 class Handler:
-    def __init__(self, simulator):
+    # without a simulator the handler runs headless: nothing is rendered unless an observer is added and
+    # scheduled callbacks are run back to back by ticks() or run() instead of the Tk event loop
+    def __init__(self, simulator=None, robot_simulation=True):
         self.map = Map()
+        # sensor rays of every pose, shared by the simulated sensors and exploration
+        self.sensor_model = SensorModel(self.map.height, self.map.width)
         self.simulator = simulator
-        if self.simulator.robot_simulation:
+        self.observers = []
+        self.pending = deque()
+        if self.simulator is not None:
+            robot_simulation = self.simulator.robot_simulation
+            self.add_observer(self.simulator)
+        self.robot_simulation = robot_simulation
+        # map updates for the android tablet, only collected once a real robot is in use
+        self.map_publisher = MapPublisher(self.map)
+        if self.robot_simulation:
             self.robot = simulated_robot.SimulatedRobot(self)
         else:
             self.robot = real_robot.RealRobot(self)
+            self.add_observer(self.map_publisher)
         self.core = Core(self)
 
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def render(self, radius=2, full=False):
+        for observer in self.observers:
+            observer.update_map(radius=radius, full=full)
+
+    def exploration_completed(self, explored_hex, obstacles_hex):
+        for observer in self.observers:
+            observer.exploration_completed(explored_hex, obstacles_hex)
+
+    # run callback after delay ms on the Tk event loop, or queue it for ticks() when headless
+    def schedule(self, delay, callback, *args):
+        if self.simulator is not None:
+            self.simulator.job = self.simulator.root.after(delay, callback, *args)
+        else:
+            self.pending.append((callback, args))
+
+    def cancel(self):
+        self.pending.clear()
+
+    # run the queued callbacks one at a time, as fast as they come
+    def ticks(self):
+        while len(self.pending) > 0:
+            callback, args = self.pending.popleft()
+            callback(*args)
+            yield
+
+    def run(self, max_ticks=None):
+        count = 0
+        for _ in self.ticks():
+            count += 1
+            if max_ticks is not None and count >= max_ticks:
+                break
+        return count
+
     def get_robot(self):
         return self.robot
 
@@ -33,81 +93,52 @@ class Handler:
 
     def left_diag(self):
         self.robot.left_diag()
-        self.simulator.update_map(radius=3)
+        self.render(radius=3)
 
     def right_diag(self):
         self.robot.right_diag()
-        self.simulator.update_map(radius=3)
+        self.render(radius=3)
 
     def move_diag(self, steps=1):
         self.robot.move_diag(steps=steps)
-        self.simulator.update_map(radius=3)
+        self.render(radius=3)
 
     def reset(self):
+        self.cancel()
         self.robot.reset()
         self.map.reset()
         self.core.reset()
+        self.map_publisher.request_keyframe()
 
     def get_location(self):
         self.robot.get_location()
 
+    # what a reading adds to map_virtual_w, positive for obstacles and negative for free cells. Takes arrays
+    # of distances and obstacle flags as well.
     def get_weighted_obstacle(self, dist, is_obstacle):
-        if not self.simulator.robot_simulation:
-            val = 0
-
-            if dist == 0:
-                val = 1000
-            elif dist == 1:
-                val = 500
-            elif dist in [2, 3]:
-                val = 10
-            else:
-                val = 1
-
-            if not is_obstacle:
-                val *= -1
-
-            return val
+        if not self.robot_simulation:
+            weight = OBSTACLE_WEIGHTS[np.minimum(dist, len(OBSTACLE_WEIGHTS) - 1)]
+            return np.where(is_obstacle, weight, -weight)
 
         return is_obstacle
 
-    # call update and rerender for every grids detected by the sensor
-    def update_map(self, x, y, dis, bearing, sensor_range):
-        try:
-            if bearing == Bearing.NORTH:
-                for i in range(dis):
-                    self.update_and_render(x, y - i - 1, 1, self.get_weighted_obstacle(i, 0))
-                if dis < sensor_range and self.map.valid_range(y - dis - 1, x):
-                    self.update_and_render(x, y - dis - 1, 1, self.get_weighted_obstacle(dis, 1))
-
-            elif bearing == Bearing.EAST:
-                for i in range(dis):
-                    self.update_and_render(x + i + 1, y, 1, self.get_weighted_obstacle(i, 0))
-                if dis < sensor_range and self.map.valid_range(y, x + dis + 1):
-                    self.update_and_render(x + dis + 1, y, 1, self.get_weighted_obstacle(dis, 1))
-
-            elif bearing == Bearing.SOUTH:
-                for i in range(dis):
-                    self.update_and_render(x, y + i + 1, 1, self.get_weighted_obstacle(i, 0))
-
-                if dis < sensor_range and self.map.valid_range(y + dis + 1, x):
-                    self.update_and_render(x, y + dis + 1, 1, self.get_weighted_obstacle(dis, 1))
-
-            else:
-                for i in range(dis):
-                    self.update_and_render(x - i - 1, y, 1, self.get_weighted_obstacle(i, 0))
-                if dis < sensor_range and self.map.valid_range(y, x - dis - 1):
-                    self.update_and_render(x - dis - 1, y, 1, self.get_weighted_obstacle(dis, 1))
-        except IndexError:
-            pass
-
-    # update map_is_explored and virtual map and call the simulator to rerender the cell
-    def update_and_render(self, x, y, is_explore, is_obstacle):
-        self.map.mark_explored(x, y, is_explore, is_obstacle, self.simulator.robot_simulation)
-        self.simulator.update_cell(x, y)
+    # mark every cell the six sensors saw from the pose in one batch and let the observers rerender the cells
+    # that changed
+    def update_sensed(self, x, y, bearing, sensor_data):
+        xs, ys, dists, is_obstacle = self.sensor_model.get_seen(x, y, bearing, sensor_data)
+        changed = self.map.mark_explored_cells(xs, ys, self.get_weighted_obstacle(dists, is_obstacle),
+                                               self.robot_simulation)
+        if len(changed) > 0:
+            for observer in self.observers:
+                observer.update_cells(changed)
 
     def connect(self, ip_addr):
+        self.robot_simulation = False
+        self.robot.close()
         self.robot = real_robot.RealRobot(self)
+        if self.map_publisher not in self.observers:
+            self.add_observer(self.map_publisher)
+        self.map_publisher.request_keyframe()
         return self.robot.connect(ip_addr)
 
     def disconnect(self):
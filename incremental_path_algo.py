@@ -0,0 +1,314 @@
+import heapq
+import time
+import numpy as np
+from constants import Bearing, COST
+from fastest_path_algo import FastestPathAlgo, Node, BEARING_OFFSETS
+import logging
+
+INFINITY = float('inf')
+
+MOVE_COSTS = {bearing: COST.MOVE_COST_DIAG if Bearing.is_diag_bearing(bearing) else COST.MOVE_COST
+              for bearing in Bearing}
+
+# search trees are kept per goal, the oldest one is dropped once there are more than this
+MAX_TREES = 8
+
+# obstacle free costs from one start bearing keyed by (diag, bearing, width, height), shared by every planner.
+# Each one is built the first time it is needed, the least recently used is dropped once there are more than
+# MAX_RELAXED_COSTS, enough for every bearing of both modes on one arena size.
+RELAXED_COSTS = {}
+MAX_RELAXED_COSTS = 16
+
+
+class SearchTree():
+    def __init__(self, goal_x, goal_y, version, change_index):
+        self.goal_x = goal_x
+        self.goal_y = goal_y
+        self.g = {}
+        self.rhs = {}
+        # binary heap of (key, seq, state) entries, open_keys holds the current key of every open state
+        self.open_list = []
+        self.open_keys = {}
+        self.seq = 0
+        self.km = 0
+        self.last_start = None
+        # position in map.cspace_changes up to which this tree has been repaired
+        self.version = version
+        self.change_index = change_index
+
+
+# D* Lite over the same (x, y, bearing) states as FastestPathAlgo. The search runs backwards from the goal
+# cell, so the tree stays valid while the robot moves and only the states next to cells whose
+# traversability changed need to be repaired before the next plan.
+class IncrementalPathAlgo(FastestPathAlgo):
+
+    def __init__(self, map, robot, handler):
+        super().__init__(map, robot, handler)
+        self.trees = {}
+        self.tree = None
+        self.turns = {
+            False: self.build_turns(diag=False),
+            True: self.build_turns(diag=True)
+        }
+        self.reverse_turns = {
+            False: self.build_reverse_turns(self.turns[False]),
+            True: self.build_reverse_turns(self.turns[True])
+        }
+
+    def run(self):
+        start = time.time()
+        start_state = (self.start_node.x, self.start_node.y, self.start_node.dir)
+
+        if self.start_node == self.goal_node:
+            self.reached_node = self.start_node
+            return True
+
+        self.tree = self.get_tree(self.goal_node.x, self.goal_node.y, start_state)
+        self.repair_tree(start_state)
+        self.compute_shortest_path(start_state)
+
+        end = time.time()
+        # the search may stop before the start itself is expanded, rhs is its cost through the best successor
+        if self.get_rhs(start_state) == INFINITY:
+            logging.debug("[D* LITE] No path found in {:0.2f}".format(end - start))
+            return False
+
+        self.reached_node = self.extract_path(start_state)
+        logging.debug("[D* LITE] Fastest path found in {:0.5f} second".format(end - start))
+        return True
+
+    def get_tree(self, goal_x, goal_y, start_state):
+        key = (goal_x, goal_y, self.diag)
+        tree = self.trees.pop(key, None)
+
+        # a robot left on a diagonal bearing by a diagonal plan cannot be reached without diagonals
+        if tree is None or tree.version != self.map.cspace_version or \
+                self.cost_between(tree.last_start, start_state) == INFINITY:
+            tree = SearchTree(goal_x, goal_y, self.map.cspace_version, len(self.map.cspace_changes))
+
+        # most recently used trees are kept at the end
+        self.trees[key] = tree
+        if len(self.trees) > MAX_TREES:
+            del self.trees[next(iter(self.trees))]
+
+        return tree
+
+    # account for the robot having moved and for every cell that changed since the tree was last used
+    def repair_tree(self, start_state):
+        tree = self.tree
+
+        if tree.last_start is None:
+            tree.last_start = start_state
+            for bearing in Bearing:
+                goal_state = (tree.goal_x, tree.goal_y, bearing)
+                tree.rhs[goal_state] = 0
+                self.push_state(goal_state, self.calculate_key(goal_state))
+            return
+
+        tree.km += self.cost_between(tree.last_start, start_state)
+        tree.last_start = start_state
+
+        changes = set(self.map.cspace_changes[tree.change_index:])
+        tree.change_index = len(self.map.cspace_changes)
+
+        # a cell only affects the forward moves into it
+        for x, y in changes:
+            for bearing, offset in BEARING_OFFSETS.items():
+                if self.can_move_forward(bearing):
+                    self.update_rhs((x - offset[0], y - offset[1], bearing))
+
+    def compute_shortest_path(self, start_state):
+        tree = self.tree
+
+        while True:
+            top = self.top_open()
+            if top is None:
+                break
+
+            old_key, state = top
+            if old_key >= self.calculate_key(start_state) and \
+                    self.get_rhs(start_state) <= self.get_g(start_state):
+                break
+
+            self.expanded_nodes += 1
+            new_key = self.calculate_key(state)
+
+            if old_key < new_key:
+                self.push_state(state, new_key)
+
+            elif self.get_g(state) > self.get_rhs(state):
+                tree.g[state] = tree.rhs[state]
+                del tree.open_keys[state]
+
+                for pred, cost in self.get_predecessors(state):
+                    if not self.is_goal(pred) and cost + tree.g[state] < self.get_rhs(pred):
+                        tree.rhs[pred] = cost + tree.g[state]
+                        self.update_vertex(pred)
+
+            else:
+                old_g = self.get_g(state)
+                tree.g[state] = INFINITY
+
+                for pred, cost in self.get_predecessors(state):
+                    if self.get_rhs(pred) == cost + old_g:
+                        self.update_rhs(pred)
+                self.update_rhs(state)
+
+    def extract_path(self, start_state):
+        node = self.start_node
+        state = start_state
+
+        # g strictly decreases along the path since every transition has a positive cost
+        while not self.is_goal(state):
+            state, cost = min(self.get_successors(state), key=lambda s: s[1] + self.get_g(s[0]))
+            node = Node(state[0], state[1], node, dir=state[2], g=node.g + cost)
+
+        return node
+
+    def is_goal(self, state):
+        return state[0] == self.tree.goal_x and state[1] == self.tree.goal_y
+
+    def get_g(self, state):
+        return self.tree.g.get(state, INFINITY)
+
+    def get_rhs(self, state):
+        return self.tree.rhs.get(state, INFINITY)
+
+    # exact cost between two states on an empty arena, a lower bound that also satisfies the triangle
+    # inequality D* Lite relies on when the start moves
+    def cost_between(self, from_state, to_state):
+        if from_state is None:
+            return 0
+
+        costs = self.get_relaxed_costs(self.diag, from_state[2])
+        centre_y = (costs.shape[1] - 1) // 2
+        centre_x = (costs.shape[2] - 1) // 2
+        return costs[to_state[2], centre_y + to_state[1] - from_state[1], centre_x + to_state[0] - from_state[0]]
+
+    def get_relaxed_costs(self, diag, bearing):
+        key = (diag, bearing, self.map.width, self.map.height)
+        costs = RELAXED_COSTS.pop(key, None)
+        if costs is None:
+            costs = self.build_relaxed_costs(diag, bearing)
+
+        # most recently used tables are kept at the end
+        RELAXED_COSTS[key] = costs
+        if len(RELAXED_COSTS) > MAX_RELAXED_COSTS:
+            del RELAXED_COSTS[next(iter(RELAXED_COSTS))]
+
+        return costs
+
+    # costs[to_bearing, dy, dx] from a robot at the centre facing from_bearing, relaxed until nothing improves.
+    # The margin of one cell around the displacements keeps the optimal detours inside the table.
+    def build_relaxed_costs(self, diag, from_bearing):
+        turns = self.turns[diag]
+        centre_x = self.map.width
+        centre_y = self.map.height
+        size_y = 2 * centre_y + 1
+        size_x = 2 * centre_x + 1
+
+        costs = np.full((8, size_y, size_x), INFINITY)
+        costs[from_bearing, centre_y, centre_x] = 0
+
+        while True:
+            relaxed = costs.copy()
+
+            for bearing in Bearing:
+                if diag or not Bearing.is_diag_bearing(bearing):
+                    dx, dy = BEARING_OFFSETS[bearing]
+                    to_cells = (slice(max(dy, 0), size_y + min(dy, 0)), slice(max(dx, 0), size_x + min(dx, 0)))
+                    from_cells = (slice(max(-dy, 0), size_y + min(-dy, 0)), slice(max(-dx, 0), size_x + min(-dx, 0)))
+                    np.minimum(relaxed[bearing][to_cells],
+                               costs[bearing][from_cells] + MOVE_COSTS[bearing],
+                               out=relaxed[bearing][to_cells])
+
+                for to_bearing, cost in turns[bearing]:
+                    np.minimum(relaxed[to_bearing], costs[bearing] + cost, out=relaxed[to_bearing])
+
+            if np.array_equal(relaxed, costs):
+                return costs
+            costs = relaxed
+
+    def calculate_key(self, state):
+        min_g = min(self.get_g(state), self.get_rhs(state))
+        return min_g + self.cost_between(self.tree.last_start, state) + self.tree.km, min_g
+
+    def push_state(self, state, key):
+        tree = self.tree
+        tree.open_keys[state] = key
+        heapq.heappush(tree.open_list, (key, tree.seq, state))
+        tree.seq += 1
+
+    # skips heap entries whose state was closed or pushed again with another key
+    def top_open(self):
+        tree = self.tree
+        while len(tree.open_list) > 0:
+            key, _, state = tree.open_list[0]
+            if tree.open_keys.get(state) == key:
+                return key, state
+            heapq.heappop(tree.open_list)
+        return None
+
+    def update_vertex(self, state):
+        if self.get_g(state) != self.get_rhs(state):
+            self.push_state(state, self.calculate_key(state))
+        else:
+            self.tree.open_keys.pop(state, None)
+
+    def update_rhs(self, state):
+        if not self.is_goal(state):
+            self.tree.rhs[state] = min([cost + self.get_g(succ) for succ, cost in self.get_successors(state)],
+                                       default=INFINITY)
+        self.update_vertex(state)
+
+    def can_move_forward(self, bearing):
+        return self.diag or not Bearing.is_diag_bearing(bearing)
+
+    def is_open_cell(self, x, y):
+        return self.map.valid_range(y, x) and self.map.is_traversable(x, y)
+
+    # turns in place available from each bearing, same as FastestPathAlgo.get_neighbours
+    def build_turns(self, diag):
+        turns = {}
+        for bearing in Bearing:
+            turns[bearing] = [(Bearing.next_bearing(bearing), COST.TURN_COST),
+                              (Bearing.prev_bearing(bearing), COST.TURN_COST)]
+            if diag or Bearing.is_diag_bearing(bearing):
+                turns[bearing].append((Bearing.next_bearing_diag(bearing), COST.TURN_COST_DIAG))
+                turns[bearing].append((Bearing.prev_bearing_diag(bearing), COST.TURN_COST_DIAG))
+        return turns
+
+    def build_reverse_turns(self, turns):
+        reverse_turns = {bearing: [] for bearing in Bearing}
+        for bearing, bearing_turns in turns.items():
+            for to_bearing, cost in bearing_turns:
+                reverse_turns[to_bearing].append((bearing, cost))
+        return reverse_turns
+
+    def get_successors(self, state):
+        x, y, bearing = state
+        successors = []
+
+        if self.can_move_forward(bearing):
+            offset = BEARING_OFFSETS[bearing]
+            if self.is_open_cell(x + offset[0], y + offset[1]):
+                successors.append(((x + offset[0], y + offset[1], bearing), MOVE_COSTS[bearing]))
+
+        for to_bearing, cost in self.turns[self.diag][bearing]:
+            successors.append(((x, y, to_bearing), cost))
+
+        return successors
+
+    def get_predecessors(self, state):
+        x, y, bearing = state
+        predecessors = []
+
+        if self.can_move_forward(bearing) and self.is_open_cell(x, y):
+            offset = BEARING_OFFSETS[bearing]
+            if self.map.valid_range(y - offset[1], x - offset[0]):
+                predecessors.append(((x - offset[0], y - offset[1], bearing), MOVE_COSTS[bearing]))
+
+        for from_bearing, cost in self.reverse_turns[self.diag][bearing]:
+            predecessors.append(((x, y, from_bearing), cost))
+
+        return predecessors
@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import deque
+
+# upper bucket edges in milliseconds, the last bucket takes everything above
+HISTOGRAM_EDGES = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_EDGES) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+        i = 0
+        while i < len(HISTOGRAM_EDGES) and ms > HISTOGRAM_EDGES[i]:
+            i += 1
+        self.buckets[i] += 1
+
+    # upper edge of the bucket holding the given fraction of the samples
+    def percentile(self, fraction):
+        if self.count == 0:
+            return None
+
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return HISTOGRAM_EDGES[i] if i < len(HISTOGRAM_EDGES) else self.max
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return dict(count=0)
+
+        return dict(count=self.count, mean=round(self.total / self.count, 3), min=round(self.min, 3),
+                    p50=self.percentile(0.5), p90=self.percentile(0.9), p99=self.percentile(0.99),
+                    max=round(self.max, 3))
+
+    def format(self):
+        labels = ['<={}'.format(edge) for edge in HISTOGRAM_EDGES] + ['>{}'.format(HISTOGRAM_EDGES[-1])]
+        return ' '.join('{}:{}'.format(label, count) for label, count in zip(labels, self.buckets) if count > 0)
+
+
+# Timing of the RPi link. Every line sent and received goes through LinkStats, sensor replies are matched to
+# the commands they answer in the order the commands were sent, so a slow run can be split into time spent
+# by the arduino and the socket (round trip), time a reply sat in the channel before the robot took it
+# (queue wait) and time between taking a reply and sending the next command (think).
+class LinkStats:
+    def __init__(self):
+        # sends come from the robot and broadcaster threads, replies from the transport loop
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.bytes_out = 0
+            self.bytes_in = 0
+            self.sent = {}
+            self.received = {}
+            # [command, time of the send or of the previous reply, replies still expected]
+            self.pending = deque()
+            self.unmatched = 0
+            self.last_taken = None
+            self.round_trip = {}
+            # times the messages still waiting in each queue were put there, the most ever waiting at once and
+            # the messages thrown away because the queue was full
+            self.queued = {}
+            self.high_water = {}
+            self.dropped = {}
+            self.waits = {}
+            self.think = Histogram()
+            self.last_snapshot = (self.started, 0, 0)
+
+    def message_sent(self, msg, replies=0):
+        now = time.time()
+        lines = [line for line in msg.split('\n') if line]
+
+        with self.lock:
+            self.bytes_out += len(msg)
+            for line in lines:
+                kind = line[0] if line[:2] not in ('M{', 'D{') else 'map'
+                self.sent[kind] = self.sent.get(kind, 0) + 1
+
+            if replies > 0 and len(lines) > 0:
+                # the reply answers the last command of the message, e.g. f1 of c\nf1
+                command = lines[-1] if lines[-1][0] != 'f' else 'f'
+                self.pending.append([command, now, replies])
+
+                if self.last_taken is not None:
+                    self.think.add(now - self.last_taken)
+                    self.last_taken = None
+
+    def line_received(self, channel, length):
+        now = time.time()
+
+        with self.lock:
+            self.bytes_in += length
+            self.received[channel] = self.received.get(channel, 0) + 1
+            if channel != 'arduino':
+                return
+
+            if len(self.pending) == 0:
+                self.unmatched += 1
+                return
+
+            # each step of a multi step move is timed from the reply before it
+            entry = self.pending[0]
+            self.round_trip.setdefault(entry[0], Histogram()).add(now - entry[1])
+            entry[1] = now
+            entry[2] -= 1
+            if entry[2] == 0:
+                self.pending.popleft()
+
+    def message_queued(self, queue):
+        with self.lock:
+            queued = self.queued.setdefault(queue, deque())
+            queued.append(time.time())
+            self.high_water[queue] = max(self.high_water.get(queue, 0), len(queued))
+
+    # full queues drop their oldest message
+    def message_dropped(self, queue):
+        with self.lock:
+            self.dropped[queue] = self.dropped.get(queue, 0) + 1
+            queued = self.queued.get(queue)
+            if queued:
+                queued.popleft()
+
+    # queues are first in first out, so the oldest time belongs to the message taken
+    def message_taken(self, queue):
+        now = time.time()
+
+        with self.lock:
+            queued = self.queued.get(queue)
+            if queued:
+                self.waits.setdefault(queue, Histogram()).add(now - queued.popleft())
+            if queue == 'arduino':
+                self.last_taken = now
+
+    def queue_cleared(self, queue):
+        with self.lock:
+            self.queued.pop(queue, None)
+
+    # replies to commands sent before a reset are thrown away with them
+    def clear_pending(self):
+        with self.lock:
+            self.pending.clear()
+            self.last_taken = None
+
+    # live counters, rates are over the whole run and since the previous snapshot
+    def snapshot(self):
+        now = time.time()
+
+        with self.lock:
+            last_time, last_out, last_in = self.last_snapshot
+            self.last_snapshot = (now, self.bytes_out, self.bytes_in)
+            elapsed = max(now - self.started, 1e-9)
+            interval = max(now - last_time, 1e-9)
+
+            return dict(elapsed=round(now - self.started, 3),
+                        sent=dict(self.sent),
+                        received=dict(self.received),
+                        pending_replies=sum(entry[2] for entry in self.pending),
+                        unmatched_replies=self.unmatched,
+                        bytes_out=self.bytes_out,
+                        bytes_in=self.bytes_in,
+                        bytes_out_per_second=round(self.bytes_out / elapsed, 1),
+                        bytes_in_per_second=round(self.bytes_in / elapsed, 1),
+                        recent_bytes_out_per_second=round((self.bytes_out - last_out) / interval, 1),
+                        recent_bytes_in_per_second=round((self.bytes_in - last_in) / interval, 1),
+                        round_trip_ms={command: h.summary() for command, h in self.round_trip.items()},
+                        queued={queue: len(queued) for queue, queued in self.queued.items()},
+                        high_water=dict(self.high_water),
+                        dropped=dict(self.dropped),
+                        queue_wait_ms={queue: h.summary() for queue, h in self.waits.items()},
+                        think_ms=self.think.summary())
+
+    # one line per histogram, for the end of a run
+    def dump(self):
+        with self.lock:
+            histograms = [('round trip ' + command, h) for command, h in sorted(self.round_trip.items())]
+            histograms += [('queue wait ' + queue, h) for queue, h in sorted(self.waits.items())]
+            histograms.append(('think', self.think))
+
+            lines = []
+            for name, histogram in histograms:
+                lines.append("{} (ms): {} | {}".format(name, histogram.summary(), histogram.format()))
+            return lines
+
+
+# shared by the transport and the simulator event loop, which takes android commands off the queues
+link_stats = LinkStats()
@@ -1,43 +1,33 @@
+import heapq
 import logging
 
 import config
 import numpy as np
 from constants import Bearing
 
-# ----------------------------------------------------------------------
-#   Map Legend:
-#   0 - not explored
-#   1 - explored
-# ----------------------------------------------------------------------
+# robot poses find_adjacent_free_space_front looks at for an unexplored cell, relative to the cell, with the
+# bearing that faces the cell
+FRONTIER_POSES = [(-1, 2, Bearing.NORTH), (0, 2, Bearing.NORTH), (1, 2, Bearing.NORTH),
+                  (-2, -1, Bearing.EAST), (-2, 0, Bearing.EAST), (-2, 1, Bearing.EAST),
+                  (-1, -2, Bearing.SOUTH), (0, -2, Bearing.SOUTH), (1, -2, Bearing.SOUTH),
+                  (2, -1, Bearing.WEST), (2, 0, Bearing.WEST), (2, 1, Bearing.WEST)]
 
-map_is_explored = \
-    [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
+
+# C-space flips logged for the incremental planners before the log is dropped and the planners start over. A full
+# log only costs them a fresh search, a log nobody reads would otherwise grow for the whole run.
+MAX_CSPACE_CHANGES = 2048
+
+
+# column by column from the right, top to bottom within a column, the order of get_unexplored_grids
+def spelunk_order(x, y):
+    return -x, y
 
 # ----------------------------------------------------------------------
 #   Map Legend:
 #   0 - free
 #   1 - obstacle
 # ----------------------------------------------------------------------
-map_sim = \
+default_map_sim = \
     [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
@@ -59,109 +49,103 @@ map_sim = \
      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
 
-# ----------------------------------------------------------------------
-#   Map Legend:
-#   0 - free
-#   1 - obstacle
-#   2 - virtual wall
-# ----------------------------------------------------------------------
-
-# map_virtual = \
-#     [[0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [1, 1, 1, 1, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 1],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1],
-#      [0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 1],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-#      [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
-
-map_virtual = \
-    [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
-
-# ----------------------------------------------------------------------
-#   Map Legend:
-#   -ve - free
-#   +ve - obstacle
-# ----------------------------------------------------------------------
-
-map_virtual_w = \
-    [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-     [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]]
-
 
 class Map:
-    # def __init__(self):
+    def __init__(self, height=config.map_size['height'], width=config.map_size['width']):
+        self.height = height
+        self.width = width
+
+        # ----------------------------------------------------------------------
+        #   Map Legend:
+        #   0 - not explored
+        #   1 - explored
+        # ----------------------------------------------------------------------
+        self.map_is_explored = np.zeros((height, width), dtype=np.uint8)
+
+        # ----------------------------------------------------------------------
+        #   Map Legend:
+        #   0 - free
+        #   1 - obstacle
+        # ----------------------------------------------------------------------
+        self.map_sim = np.zeros((height, width), dtype=np.uint8)
+        if self.map_sim.shape == (len(default_map_sim), len(default_map_sim[0])):
+            self.map_sim[:] = default_map_sim
+
+        # ----------------------------------------------------------------------
+        #   Map Legend:
+        #   0 - free
+        #   1 - obstacle
+        # ----------------------------------------------------------------------
+        self.map_virtual = np.zeros((height, width), dtype=np.uint8)
+
+        # ----------------------------------------------------------------------
+        #   Map Legend:
+        #   0   - robot center can stand here
+        #   +ve - number of obstacle/unexplored cells under the robot, +1 on the border
+        # ----------------------------------------------------------------------
+        self.map_cspace_count = np.zeros((height, width), dtype=np.int16)
+
+        # cells whose traversability flipped, in order, so incremental planners can repair their search.
+        # The log is cleared and the version bumped whenever the C-space is rebuilt from scratch or the log
+        # outgrows MAX_CSPACE_CHANGES.
+        self.cspace_changes = []
+        self.cspace_version = 0
+
+        # ----------------------------------------------------------------------
+        #   Map Legend:
+        #   -ve - free
+        #   +ve - obstacle
+        # ----------------------------------------------------------------------
+        # int32 rather than int16: a cell seen at distance 0 adds 1000 per reading
+        self.map_virtual_w = np.zeros((height, width), dtype=np.int32)
+
+        # explored cells in the whole arena and in every named region, kept up to date by mark_explored
+        # so coverage queries never have to scan the arena
+        self.explored_count = 0
+        self.regions = {}
+        self.region_counts = {}
+        # names of the regions each cell belongs to, regions may overlap
+        self.cell_regions = [[[] for _ in range(width)] for _ in range(height)]
+
+        half_width = width // 2
+        half_height = height // 2
+        self.add_region('north_west', 0, 0, half_width, half_height)
+        self.add_region('north_east', half_width, 0, width, half_height)
+        self.add_region('south_west', 0, half_height, half_width, height)
+        self.add_region('south_east', half_width, half_height, width, height)
+
+        # (explored_hex, obstacles_hex) from create_map_descriptor, None once the map has changed
+        self.descriptor = None
+
+        # unexplored cells with a pose in front of them the robot can stand on, kept up to date by mark_explored.
+        # The heap orders them by frontier_score, which must not change while a cell is on the frontier, and
+        # may still hold cells that have left the frontier, those are skipped when they come up.
+        self.frontier = set()
+        self.frontier_heap = []
+        self.frontier_score = spelunk_order
+
+        self.reset()
 
     def is_explored(self, x, y):
         try:
-            return map_is_explored[y][x]
+            return self.map_is_explored[y, x]
         except IndexError:
             logging.debug(str(y) + ", " + str(x))
 
     def is_obstacle(self, x, y, sim=True, use_confidence=False):
         if sim:
-            return map_sim[y][x] == 1
+            return self.map_sim[y, x] == 1
 
         if use_confidence:
-            return map_virtual_w[y][x] >= 1000
+            return self.map_virtual_w[y, x] >= 1000
 
-        return map_virtual[y][x] == 1
+        return self.map_virtual[y, x] == 1
 
     def is_free(self, x, y, sim=True):
         return not self.is_obstacle(x, y, sim)
 
     def valid_range(self, y, x):
-        return (0 <= y < config.map_size['height']) and (0 <= x < config.map_size['width'])
+        return (0 <= y < self.height) and (0 <= x < self.width)
 
     def set_map(self, y, x, stat):
         if not self.valid_range(y, x):
@@ -174,144 +158,317 @@ class Map:
         #     logging.debug( "Error: set map wrong status!", tag="Map", lv='quiet' )
 
     def mark_explored(self, x, y, is_explored, is_obstacle, is_sim):
-        try:
-            map_is_explored[y][x] = is_explored
+        # negative indices would silently wrap around to the other side of the arena
+        if not self.valid_range(y, x):
+            return
+
+        was_blocked = self.is_blocked(x, y)
+        was_explored = self.map_is_explored[y, x] != 0
+        was_obstacle = self.map_virtual[y, x]
 
-            if (x in [0, 1, 2] and y in [17, 18, 19]) or (x in [12, 13, 14] and y in [0, 1, 2]):
-                return
+        self.map_is_explored[y, x] = is_explored
 
+        if (is_explored != 0) != was_explored:
+            delta = -1 if was_explored else 1
+            self.explored_count += delta
+            for name in self.cell_regions[y][x]:
+                self.region_counts[name] += delta
+
+        if not self.in_start_or_goal_zone(x, y):
             if is_sim:
-                map_virtual[y][x] = is_obstacle
+                self.map_virtual[y, x] = is_obstacle
             else:
-                map_virtual_w[y][x] += is_obstacle
+                self.map_virtual_w[y, x] += is_obstacle
 
-                map_virtual[y][x] = 1 if map_virtual_w[y][x] > 0 else 0
+                self.map_virtual[y, x] = 1 if self.map_virtual_w[y, x] > 0 else 0
                 # map_virtual[y][x] = is_obstacle
 
-        except IndexError:
-            pass
-
-    def set_virtual_wall_around(self, x, y):
-        for i in range(3):
-            for j in range(3):
-                if (self.valid_range(y + j - 1, x + i - 1) and map_virtual[y + j - 1][x + i - 1] == 0):
-                    # logging.debug(y + j - 1, x + i - 1)
-                    map_virtual[y + j - 1][x + i - 1] = 2
-
-    def set_virtual_wall_border(self):
-        for y in range(config.map_size['height']):
-            if (map_virtual[y][0] != 1):
-                map_virtual[y][0] = 2
-            if (map_virtual[y][config.map_size['width'] - 1] != 1):
-                map_virtual[y][config.map_size['width'] - 1] = 2
-
-        for x in range(config.map_size['width']):
-            if (map_virtual[0][x] != 1):
-                map_virtual[0][x] = 2
-            if (map_virtual[config.map_size['height'] - 1][x] != 1):
-                map_virtual[config.map_size['height'] - 1][x] = 2
-
-    def is_virtual_wall(self, x, y):
-        return map_virtual[y][x] == 2
+        if (is_explored != 0) != was_explored or self.map_virtual[y, x] != was_obstacle:
+            self.descriptor = None
+
+        if self.is_blocked(x, y) != was_blocked:
+            self.update_cspace_count(x, y, -1 if was_blocked else 1)
+
+        if (is_explored != 0) != was_explored:
+            self.update_frontier(x, y)
+
+    # mark_explored for every cell of one sensing at once, the cells given as arrays. is_obstacle holds the
+    # obstacle flags or, off the simulator, the weights to add. The arrays are written in one go and the C-space
+    # and frontier are then updated cell by cell in the order given, as mark_explored would. A cell given more
+    # than once ends up as if it had been marked once per reading: its weights add up and in the simulator the
+    # last flag wins. Returns the (x, y) of the cells whose explored or obstacle state changed.
+    def mark_explored_cells(self, xs, ys, is_obstacle, is_sim):
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        xs, ys, is_obstacle = xs[inside], ys[inside], is_obstacle[inside]
+        keys = ys * self.width + xs
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        cell_xs, cell_ys = xs[first], ys[first]
+
+        was_explored = self.map_is_explored[cell_ys, cell_xs] != 0
+        was_obstacle = self.map_virtual[cell_ys, cell_xs]
+        was_blocked = (was_obstacle == 1) | ~was_explored
+
+        self.map_is_explored[cell_ys, cell_xs] = 1
+
+        outside_zones = ~self.in_start_or_goal_zone(xs, ys)
+        if is_sim:
+            # the last reading of a cell wins
+            _, last = np.unique(keys[::-1], return_index=True)
+            last = len(keys) - 1 - last
+            last = last[outside_zones[last]]
+            self.map_virtual[ys[last], xs[last]] = is_obstacle[last]
+        else:
+            # a cell read by several sensors adds up all of their weights
+            open_xs, open_ys = xs[outside_zones], ys[outside_zones]
+            np.add.at(self.map_virtual_w, (open_ys, open_xs), is_obstacle[outside_zones])
+            self.map_virtual[open_ys, open_xs] = self.map_virtual_w[open_ys, open_xs] > 0
+
+        is_obstacle = self.map_virtual[cell_ys, cell_xs]
+        changed = ~was_explored | (is_obstacle != was_obstacle)
+        if changed.any():
+            self.descriptor = None
+
+        self.explored_count += int(np.count_nonzero(~was_explored))
+        flipped = (is_obstacle == 1) != was_blocked
+        for x, y, newly_explored, blocked, flip in zip(cell_xs.tolist(), cell_ys.tolist(), (~was_explored).tolist(),
+                                                       was_blocked.tolist(), flipped.tolist()):
+            if newly_explored:
+                for name in self.cell_regions[y][x]:
+                    self.region_counts[name] += 1
+            if flip:
+                self.update_cspace_count(x, y, -1 if blocked else 1)
+            if newly_explored:
+                self.update_frontier(x, y)
+
+        return list(zip(cell_xs[changed].tolist(), cell_ys[changed].tolist()))
+
+    def is_blocked(self, x, y):
+        return self.map_virtual[y, x] == 1 or self.map_is_explored[y, x] == 0
+
+    # the robot is 3x3, so its center may only stand on cells whose 3x3 neighbourhood is explored and free,
+    # and never on the arena border. map_cspace_count counts the blocked cells under the robot footprint,
+    # so a single cell changing only touches the 3x3 block around it.
+    def update_cspace_count(self, x, y, delta):
+        min_x = max(x - 1, 0)
+        min_y = max(y - 1, 0)
+        block = self.map_cspace_count[min_y:y + 2, min_x:x + 2]
+
+        was_free = block == 0
+        block += delta
+
+        for dy, dx in np.argwhere(was_free != (block == 0)):
+            self.cspace_changes.append((min_x + int(dx), min_y + int(dy)))
+            self.update_frontier_around(min_x + int(dx), min_y + int(dy))
+
+        if len(self.cspace_changes) > MAX_CSPACE_CHANGES:
+            self.cspace_changes.clear()
+            self.cspace_version += 1
+
+    # full rebuild, only needed when the whole map is replaced at once
+    def rebuild_cspace(self):
+        blocked = np.pad((self.map_virtual == 1) | (self.map_is_explored == 0), 1).astype(np.int16)
+
+        count = np.zeros((self.height, self.width), dtype=np.int16)
+        for dy in range(3):
+            for dx in range(3):
+                count += blocked[dy:dy + self.height, dx:dx + self.width]
+
+        border = np.zeros((self.height, self.width), dtype=bool)
+        border[[0, -1], :] = True
+        border[:, [0, -1]] = True
+        count += border
+
+        self.map_cspace_count[:] = count
+        self.cspace_changes.clear()
+        self.cspace_version += 1
+        self.rebuild_frontier()
+
+    def is_frontier(self, x, y):
+        if self.map_is_explored[y, x] != 0:
+            return False
+
+        for dx, dy, _ in FRONTIER_POSES:
+            if self.valid_range(y + dy, x + dx) and self.map_cspace_count[y + dy, x + dx] == 0:
+                return True
+        return False
+
+    def update_frontier(self, x, y):
+        if not self.is_frontier(x, y):
+            self.frontier.discard((x, y))
+        elif (x, y) not in self.frontier:
+            self.frontier.add((x, y))
+            heapq.heappush(self.frontier_heap, (self.frontier_score(x, y), x, y))
+            # cells that have left the frontier are dropped from the heap once they outnumber the rest
+            if len(self.frontier_heap) > 2 * len(self.frontier) + 64:
+                self.heapify_frontier()
+
+    # a pose changed traversability, which only matters to the cells it is in front of
+    def update_frontier_around(self, x, y):
+        for dx, dy, _ in FRONTIER_POSES:
+            if self.valid_range(y - dy, x - dx):
+                self.update_frontier(x - dx, y - dy)
+
+    def rebuild_frontier(self):
+        traversable = np.pad(self.map_cspace_count == 0, 2)
+        near_pose = np.zeros((self.height, self.width), dtype=bool)
+        for dx, dy, _ in FRONTIER_POSES:
+            near_pose |= traversable[2 + dy:2 + dy + self.height, 2 + dx:2 + dx + self.width]
+
+        ys, xs = np.nonzero(near_pose & (self.map_is_explored == 0))
+        self.frontier = set(zip(xs.tolist(), ys.tolist()))
+        self.heapify_frontier()
+
+    def heapify_frontier(self):
+        self.frontier_heap = [(self.frontier_score(x, y), x, y) for x, y in self.frontier]
+        heapq.heapify(self.frontier_heap)
+
+    # score(x, y) gives the sort key of a cell, the lowest is taken first
+    def set_frontier_score(self, score):
+        self.frontier_score = score
+        self.rebuild_frontier()
+
+    def get_frontier_cell(self):
+        while len(self.frontier_heap) > 0:
+            _, x, y = self.frontier_heap[0]
+            if (x, y) in self.frontier:
+                return x, y
+            heapq.heappop(self.frontier_heap)
+        return None
+
+    # every pose facing a frontier cell the robot can stand on, as (x, y, bearing) -> cell
+    def get_frontier_poses(self):
+        poses = {}
+        for x, y in self.frontier:
+            for dx, dy, bearing in FRONTIER_POSES:
+                if self.valid_range(y + dy, x + dx) and self.map_cspace_count[y + dy, x + dx] == 0:
+                    poses.setdefault((x + dx, y + dy, bearing), (x, y))
+        return poses
+
+    # the first frontier cell and the pose in front of it with the bearing to face it, (None, None) once the
+    # frontier is empty
+    def get_frontier_target(self):
+        cell = self.get_frontier_cell()
+        if cell is None:
+            return None, None
+        return self.find_adjacent_free_space_front(cell[0], cell[1])
+
+    def is_traversable(self, x, y):
+        return self.map_cspace_count[y, x] == 0
+
+    # the robot center can stand on (x, y) and every cell under the robot has been seen free with at least
+    # min_free_weight, or is in the start or goal zone which is always free
+    def is_confirmed_free(self, x, y):
+        if not self.is_traversable(x, y):
+            return False
+
+        ys, xs = np.mgrid[y - 1:y + 2, x - 1:x + 2]
+        confirmed = self.map_virtual_w[y - 1:y + 2, x - 1:x + 2] <= -config.pipeline['min_free_weight']
+        return bool(np.all(confirmed | self.in_start_or_goal_zone(xs, ys)))
 
     def is_valid_open(self, x, y):
-        return map_virtual[y][x] == 0 and map_is_explored[y][x] == 1
+        return self.map_virtual[y, x] == 0 and self.map_is_explored[y, x] == 1
 
-    def is_physical_wall(self, x, y):
-        return map_virtual[y][x] == 1
+    # the robot always starts in the bottom left corner and ends in the top right corner. Takes arrays of
+    # cells as well.
+    def in_start_or_goal_zone(self, x, y):
+        return ((x < 3) & (y >= self.height - 3)) | ((x >= self.width - 3) & (y < 3))
 
     def get_coverage(self):
-        flattened = [i for sub in map_is_explored for i in sub]
-
-        return (sum(flattened) / (config.map_size['height'] * config.map_size['width'])) * 100
-
+        return (self.explored_count / self.map_is_explored.size) * 100
+
+    # coverage of the cells with x0 <= x < x1 and y0 <= y < y1, tracked from now on under the given name
+    def add_region(self, name, x0, y0, x1, y1):
+        if name in self.regions:
+            self.remove_region(name)
+
+        self.regions[name] = (x0, y0, x1, y1)
+        self.region_counts[name] = int(np.count_nonzero(self.map_is_explored[max(y0, 0):y1, max(x0, 0):x1]))
+        for y in range(max(y0, 0), min(y1, self.height)):
+            for x in range(max(x0, 0), min(x1, self.width)):
+                self.cell_regions[y][x].append(name)
+
+    def remove_region(self, name):
+        x0, y0, x1, y1 = self.regions.pop(name)
+        del self.region_counts[name]
+        for y in range(max(y0, 0), min(y1, self.height)):
+            for x in range(max(x0, 0), min(x1, self.width)):
+                self.cell_regions[y][x].remove(name)
+
+    def get_region_coverage(self, name):
+        x0, y0, x1, y1 = self.regions[name]
+        size = (min(x1, self.width) - max(x0, 0)) * (min(y1, self.height) - max(y0, 0))
+        return (self.region_counts[name] / size) * 100
+
+    # recount after map_is_explored has been written to directly
+    def recount_explored(self):
+        self.explored_count = int(np.count_nonzero(self.map_is_explored))
+        for name, (x0, y0, x1, y1) in self.regions.items():
+            self.region_counts[name] = int(np.count_nonzero(self.map_is_explored[max(y0, 0):y1, max(x0, 0):x1]))
+
+    # both parts list the cells row by row from the bottom, the explored part is framed by 11 on each side
+    # and the obstacle part only covers explored cells, padded at the end to whole bytes.
+    # The strings are cached until mark_explored, reset or a decode changes the map.
     def create_map_descriptor(self):
-        explored_str = [str(i) for sub in reversed(map_is_explored) for i in sub]
-        explored_str.insert(0, '1')
-        explored_str.insert(0, '1')
-        explored_str.append('1')
-        explored_str.append('1')
-        explored_str = "".join(explored_str)
-
-        obstacles_str = []
-        reversed_list = list(reversed(map_virtual))
-
-        for y, row in enumerate(reversed(map_is_explored)):
-            for x, val in enumerate(row):
-                if val:
-                    obstacles_str.append(str(reversed_list[y][x]))
-
-        padding_len = 8 - (len(obstacles_str) % 8)
-        obstacles_str.extend(['0' for _ in range(padding_len)])
-
-        explored_hex = hex(int(explored_str, 2))[2:]
-
-        i = 0
-        obstacles_hex = []
+        if self.descriptor is None:
+            explored = self.map_is_explored[::-1].reshape(-1) != 0
+            explored_hex = np.packbits(np.concatenate(([1, 1], explored, [1, 1]))).tobytes().hex()
 
-        while i < len(obstacles_str) - 4:
-            obstacles_hex.append(hex(int("".join(obstacles_str[i:i + 4]), 2))[2:])
-            i += 4
+            obstacles = self.map_virtual[::-1].reshape(-1)[explored] != 0
+            obstacles_hex = np.packbits(obstacles).tobytes().hex()
 
-        obstacles_hex = ("".join(obstacles_hex))
+            self.descriptor = explored_hex, obstacles_hex
 
-        return explored_hex, obstacles_hex
+        return self.descriptor
 
+    # obstacle part of a fully explored map, any bits past the arena are padding
     def decode_map_descriptor(self, obstacles_hex):
-        map_bin = []
-        size = config.map_size['height'] * config.map_size['width']
+        size = self.height * self.width
+        map_bin = np.unpackbits(np.frombuffer(bytes.fromhex(obstacles_hex.strip().ljust(2 * ((size + 7) // 8), '0')),
+                                              dtype=np.uint8))
+        map_bin = map_bin[:size].reshape((self.height, self.width))[::-1]
 
-        for hex in obstacles_hex:
-            map_bin.extend(bin(int(hex, 16))[2:].zfill(4))
+        self.map_sim[:] = map_bin
+        self.map_virtual[:] = map_bin
+        self.descriptor = None
+        self.rebuild_cspace()
 
-        map_bin = [int(x) for x in map_bin]
+        logging.debug(self.map_sim)
 
-        map_bin = np.array(list(reversed(map_bin)))[:size].reshape(
-            (config.map_size['height'], config.map_size['width'])
-        )
-
-        for i in range(len(map_bin)):
-            map_bin[i] = list(reversed(map_bin[i]))
-
-        for x in range(config.map_size['width']):
-            for y in range(config.map_size['height']):
-                map_sim[y][x] = map_bin[y][x]
-                map_virtual[y][x] = map_bin[y][x]
-
-        logging.debug(map_sim)
+    # the whole arena is known, as it is for the fastest path run after exploration
+    def mark_all_explored(self):
+        self.map_is_explored[:] = 1
+        self.descriptor = None
+        self.recount_explored()
+        self.rebuild_cspace()
 
     def clear_map_for_real_exploration(self):
-        for x in range(config.map_size['width']):
-            for y in range(config.map_size['height']):
-                map_sim[y][x] = 0
+        self.map_sim[:] = 0
 
     def reset(self):
-        # map_virtual = [[0 for x in range(config.map_size['width'])] for y in range(config.map_size['height'])]
-        # map_is_explored = [[0 for x in range(config.map_size['width'])] for y in range(config.map_size['height'])]
-
-        for x in range(config.map_size['width']):
-            for y in range(config.map_size['height']):
-                map_virtual[y][x] = 0
-                map_is_explored[y][x] = 0
+        self.map_virtual[:] = 0
+        self.map_is_explored[:] = 0
 
         # assuming robot always start at the start position
-        for i in range(3):
-            for j in range(3):
-                map_is_explored[config.map_size['height'] - 1 - i][j] = 1
-                map_is_explored[i][config.map_size['width'] - 1 - j] = 1
+        self.map_is_explored[-3:, :3] = 1
+        self.map_is_explored[:3, -3:] = 1
+
+        self.descriptor = None
+        self.recount_explored()
+        self.rebuild_cspace()
 
     def get_unexplored_grid(self):
-        for i in range(config.map_size['height']):
-            for j in range(config.map_size['width']):
-                if (map_is_explored[config.map_size['height'] - i - 1][j] == 0):
-                    return j, config.map_size['height'] - i - 1
+        for i in range(self.height):
+            for j in range(self.width):
+                if (self.map_is_explored[self.height - i - 1, j] == 0):
+                    return j, self.height - i - 1
 
     def is_free_space(self, x, y):
         try:
             for i in range(-1, 2):
                 for j in range(-1, 2):
-                    # logging.debug(map_virtual[y + j][x + i])
-                    if not self.is_explored(x + i, y + j) or map_virtual[y + j][x + i] != 0:
+                    # logging.debug(self.map_virtual[y + j, x + i])
+                    if not self.is_explored(x + i, y + j) or self.map_virtual[y + j, x + i] != 0:
                         return False
             return True
         except IndexError:
@@ -344,12 +501,9 @@ class Map:
         # if cant find, will return None
 
     def get_unexplored_grids(self):
-        unexplored_grids = []
-        for j in range(config.map_size['width']):
-            for i in range(config.map_size['height']):
-                if (map_is_explored[i][config.map_size['width'] - j - 1] == 0):
-                    unexplored_grids.append((config.map_size['width'] - j - 1, i))
-        return unexplored_grids
+        # column by column from the right, top to bottom within a column
+        columns, rows = np.nonzero(self.map_is_explored[:, ::-1].T == 0)
+        return [(self.width - int(j) - 1, int(i)) for j, i in zip(columns, rows)]
 
     def find_adjacent_free_space_front(self, x, y, ir=False):
         center = {
@@ -369,8 +523,8 @@ class Map:
         for k, v in center.items():
             for e in v:
                 # logging.debug("coordinates: ", e, k)
-                if e[0] > 0 and e[0] < config.map_size['width'] - 1 and e[1] > 0 and e[1] < config.map_size[
-                    'height'] - 1 and self.is_free_space(e[0], e[1]):
+                if e[0] > 0 and e[0] < self.width - 1 and e[1] > 0 and e[1] < self.height - 1 and \
+                        self.is_free_space(e[0], e[1]):
                     return e, k
 
     def find_left_wall_or_obstacle(self, x, y, bearing):
@@ -384,10 +538,10 @@ class Map:
                 if y == 1:
                     left_wall = True
             elif bearing == Bearing.SOUTH:
-                if x == 13:
+                if x == self.width - 2:
                     left_wall = True
             else:
-                if y == 18:
+                if y == self.height - 2:
                     left_wall = True
 
             if left_wall:
@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+import config
+from observer import MapObserver
+
+# Builds the map messages sent to the android tablet. A keyframe is the full map descriptor,
+# M{"map": [{"length": 300, "explored": ..., "obstacle": ...}], "robotPosition": [x, y, degrees]}
+# and a delta only lists the cells that changed since the last message,
+# D{"cells": [[x, y, explored, obstacle], ...], "robotPosition": [x, y, degrees]}
+class MapPublisher(MapObserver):
+    def __init__(self, map):
+        self.map = map
+        # cells touched by the sensors since the last message, and the cell values the tablet last received
+        self.dirty = set()
+        self.sent_explored = np.zeros(map.map_is_explored.shape, dtype=np.uint8)
+        self.sent_obstacle = np.zeros(map.map_virtual.shape, dtype=np.uint8)
+        self.messages_since_keyframe = 0
+        self.keyframe_requested = True
+        # cells are reported by the main thread while the broadcaster thread builds the messages
+        self.lock = threading.Lock()
+
+    # sensors also report cells past the arena walls
+    def update_cell(self, x, y):
+        if not self.map.valid_range(y, x):
+            return
+        with self.lock:
+            self.dirty.add((x, y))
+
+    # the batch only holds cells inside the arena
+    def update_cells(self, cells):
+        with self.lock:
+            self.dirty.update(cells)
+
+    # the whole map was redrawn, e.g. after a reset, the tablet needs a full resync
+    def update_map(self, radius=2, full=False):
+        if full:
+            self.request_keyframe()
+
+    def request_keyframe(self):
+        self.keyframe_requested = True
+
+    def next_message(self, x, y, degrees, keyframe=False):
+        with self.lock:
+            dirty = self.dirty
+            self.dirty = set()
+
+        cells = []
+        for cell_x, cell_y in dirty:
+            if self.map.map_is_explored[cell_y, cell_x] != self.sent_explored[cell_y, cell_x] or \
+                    self.map.map_virtual[cell_y, cell_x] != self.sent_obstacle[cell_y, cell_x]:
+                cells.append((cell_x, cell_y))
+
+        if keyframe or self.keyframe_requested or not config.android_map['delta'] or \
+                len(cells) > config.android_map['max_delta_cells'] or \
+                self.messages_since_keyframe + 1 >= config.android_map['keyframe_interval']:
+            return self.keyframe(x, y, degrees)
+
+        self.messages_since_keyframe += 1
+        for cell_x, cell_y in cells:
+            self.sent_explored[cell_y, cell_x] = self.map.map_is_explored[cell_y, cell_x]
+            self.sent_obstacle[cell_y, cell_x] = self.map.map_virtual[cell_y, cell_x]
+
+        cells = ", ".join("[{}, {}, {}, {}]".format(cell_x, cell_y, self.sent_explored[cell_y, cell_x],
+                                                    self.sent_obstacle[cell_y, cell_x]) for cell_x, cell_y in cells)
+        return "D{\"cells\": [" + cells + "], \"robotPosition\": [" + str(x) + ", " + str(y) + ", " + \
+               degrees + "]}\n"
+
+    def keyframe(self, x, y, degrees):
+        self.keyframe_requested = False
+        self.messages_since_keyframe = 0
+        self.sent_explored[:] = self.map.map_is_explored
+        self.sent_obstacle[:] = self.map.map_virtual
+
+        explored_hex, obstacles_hex = self.map.create_map_descriptor()
+        return "M{\"map\": [{\"length\": 300, \"explored\": \"" + explored_hex + "\", \"obstacle\": \"" + \
+               obstacles_hex + "\"}], \"robotPosition\":[" + str(x) + ", " + str(y) + "," + degrees + "]}\n"
+
+
+# sends the map to the tablet from its own thread, at most max_rate messages per second. Poses notified
+# while a message is waiting for its turn are merged, only the latest one is sent.
+class MapBroadcaster(threading.Thread):
+    def __init__(self, publisher, send):
+        super().__init__(name='map broadcaster', daemon=True)
+        self.publisher = publisher
+        self.send = send
+        self.condition = threading.Condition()
+        self.pose = None
+        self.keyframe = False
+        self.running = True
+        self.last_sent = 0
+
+        self.notified = 0
+        self.sent = 0
+        # notifications replaced by a newer pose before they were sent, and messages the socket refused
+        self.merged = 0
+        self.dropped = 0
+
+    def notify(self, x, y, degrees, keyframe=False):
+        with self.condition:
+            self.notified += 1
+            if self.pose is not None:
+                self.merged += 1
+            self.pose = (x, y, degrees)
+            self.keyframe = self.keyframe or keyframe
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.pose is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+
+            # later notifications are merged in while waiting out the rate limit
+            delay = self.last_sent + 1 / config.android_map['max_rate'] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self.condition:
+                (x, y, degrees), keyframe = self.pose, self.keyframe
+                self.pose = None
+                self.keyframe = False
+
+            message = self.publisher.next_message(x, y, degrees, keyframe)
+            self.last_sent = time.time()
+
+            if self.send(message):
+                self.sent += 1
+            else:
+                # the tablet may have missed the cells in this delta
+                self.dropped += 1
+                self.publisher.request_keyframe()
+                logging.debug("[MAP] Unable to send map update")
+
+    def get_stats(self):
+        return dict(notified=self.notified, sent=self.sent, merged=self.merged, dropped=self.dropped)
@@ -0,0 +1,224 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+import config
+
+# (height, width) of an obstacle block -> relative frequency
+DEFAULT_SHAPES = {
+    (1, 1): 0.3,
+    (1, 2): 0.15,
+    (2, 1): 0.15,
+    (1, 3): 0.1,
+    (3, 1): 0.1,
+    (2, 2): 0.1,
+    (1, 4): 0.05,
+    (4, 1): 0.05
+}
+
+def parse_shapes(text):
+    shapes = {}
+    for item in text.split(','):
+        size, weight = item.split(':')
+        height, width = size.split('x')
+        shapes[(int(height), int(width))] = float(weight)
+    return shapes
+
+
+# drop blocks at random positions, every maze of the batch at once
+def place_blocks(rng, count, height, width, density, shapes):
+    sizes = list(shapes.keys())
+    weights = np.array([shapes[size] for size in sizes], dtype=float)
+    weights /= weights.sum()
+
+    mean_area = sum(h * w * p for (h, w), p in zip(sizes, weights))
+    num_blocks = max(1, int(round(density * height * width / mean_area)))
+
+    kinds = rng.choice(len(sizes), size=(count, num_blocks), p=weights)
+    ys = rng.integers(0, height, size=(count, num_blocks))
+    xs = rng.integers(0, width, size=(count, num_blocks))
+    maze_index = np.broadcast_to(np.arange(count)[:, None], (count, num_blocks))
+
+    mazes = np.zeros((count, height, width), dtype=bool)
+    for kind, (h, w) in enumerate(sizes):
+        chosen = kinds == kind
+        index, y, x = maze_index[chosen], ys[chosen], xs[chosen]
+        for dy in range(h):
+            for dx in range(w):
+                inside = (y + dy < height) & (x + dx < width)
+                mazes[index[inside], y[inside] + dy, x[inside] + dx] = True
+
+    # the robot starts in the bottom left corner and ends in the top right corner, see Map.in_start_or_goal_zone
+    mazes[:, -3:, :3] = False
+    mazes[:, :3, -3:] = False
+    return mazes
+
+
+# the cells the robot center can get to from the start moving north, south, east and west, as reached[m, y]
+# with bit x set for (x, y). The C-space of every maze is flood filled at once with each row packed into a
+# single integer, so one fill step is a handful of shifts over (count, height) words. The fill of a maze stops
+# early once it has reached the goal.
+def fill_from_start(mazes):
+    count, height, width = mazes.shape
+    if width > 64:
+        raise ValueError("Arenas wider than 64 cells are not supported")
+
+    padded = np.pad(mazes, ((0, 0), (1, 1), (1, 1)))
+    blocked = np.zeros(mazes.shape, dtype=bool)
+    for dy in range(3):
+        for dx in range(3):
+            blocked |= padded[:, dy:dy + height, dx:dx + width]
+    blocked[:, [0, -1], :] = True
+    blocked[:, :, [0, -1]] = True
+
+    # bit x of free[m, y] is set when the robot center can stand on (x, y)
+    free = np.packbits(~blocked, axis=2, bitorder='little')
+    free = np.pad(free, ((0, 0), (0, 0), (0, 8 - free.shape[2]))).view('<u8')[:, :, 0].astype(np.uint64)
+
+    start_bit = np.uint64(1 << 1)
+    goal_bit = np.uint64(1 << (width - 2))
+    one = np.uint64(1)
+
+    reached = np.zeros((count, height), dtype=np.uint64)
+    reached[:, height - 2] = free[:, height - 2] & start_bit
+
+    # mazes drop out once the goal is reached or the fill stops growing
+    active = np.flatnonzero(reached[:, height - 2])
+    while len(active) > 0:
+        current = reached[active]
+        active_free = free[active]
+        grown = current
+        # mask after each direction, otherwise the fill would leak through diagonal corners
+        for _ in range(4):
+            grown = (grown | (grown << one) | (grown >> one)) & active_free
+            vertical = grown.copy()
+            vertical[:, 1:] |= grown[:, :-1]
+            vertical[:, :-1] |= grown[:, 1:]
+            grown = vertical & active_free
+
+        reached[active] = grown
+        growing = (grown != current).any(axis=1)
+        active = active[growing & ((grown[:, 1] & goal_bit) == 0)]
+
+    return reached
+
+
+# whether the robot center can get from the start to the goal
+def is_reachable(mazes):
+    width = mazes.shape[2]
+    return (fill_from_start(mazes)[:, 1] & np.uint64(1 << (width - 2))) != 0
+
+
+# clears the obstacle cells under the robot along a path from the start to the goal, in every maze at once. The
+# path only steps north and east, so each step uncovers a row or a column of three cells the robot has not been
+# on yet and the cells a path clears add up over its steps. The path clearing the fewest of them is found row by
+# row like an edit distance, ties are broken at random. Blocks are only ever taken away, a repaired maze is
+# sparser than the density it was sampled at.
+def repair_mazes(rng, mazes):
+    count, height, width = mazes.shape
+    start_x, start_y = 1, height - 2
+    goal_x, goal_y = width - 2, 1
+
+    cells = mazes.astype(np.int16)
+    # across[:, y, x] counts the obstacles of row y from x - 1 to x + 1, down[:, y, x] those of column x from
+    # y - 1 to y + 1. A step north onto (x, y) uncovers across[:, y - 1, x], a step east down[:, y, x + 1].
+    across = np.zeros_like(cells)
+    across[:, :, 1:-1] = cells[:, :, :-2] + cells[:, :, 1:-1] + cells[:, :, 2:]
+    down = np.zeros_like(cells)
+    down[:, 1:-1, :] = cells[:, :-2, :] + cells[:, 1:-1, :] + cells[:, 2:, :]
+
+    cleared = np.zeros((count, height, width), dtype=np.int32)
+    from_south = np.zeros((count, height, width), dtype=bool)
+    for y in range(start_y, goal_y - 1, -1):
+        for x in range(start_x, goal_x + 1):
+            if y == start_y and x == start_x:
+                continue
+            if y == start_y:
+                cleared[:, y, x] = cleared[:, y, x - 1] + down[:, y, x + 1]
+                continue
+            if x == start_x:
+                cleared[:, y, x] = cleared[:, y + 1, x] + across[:, y - 1, x]
+                from_south[:, y, x] = True
+                continue
+
+            north = cleared[:, y + 1, x] + across[:, y - 1, x]
+            east = cleared[:, y, x - 1] + down[:, y, x + 1]
+            from_south[:, y, x] = (north < east) | ((north == east) & (rng.random(count) < 0.5))
+            cleared[:, y, x] = np.where(from_south[:, y, x], north, east)
+
+    # walk the path back from the goal, clearing the footprint at every pose
+    index = np.arange(count)
+    xs = np.full(count, goal_x)
+    ys = np.full(count, goal_y)
+    for _ in range(start_y - goal_y + goal_x - start_x + 1):
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                mazes[index, ys + dy, xs + dx] = False
+        north = from_south[index, ys, xs]
+        ys = ys + north
+        xs = xs - ~north
+
+    return mazes
+
+
+def generate_mazes(count, height=config.map_size['height'], width=config.map_size['width'], density=0.1,
+                   shapes=None, seed=None):
+    rng = np.random.default_rng(seed)
+    if shapes is None:
+        shapes = DEFAULT_SHAPES
+
+    mazes = place_blocks(rng, count, height, width, density, shapes)
+    blocked = np.flatnonzero(~is_reachable(mazes))
+    if len(blocked) > 0:
+        logging.debug("Repairing {} blocked mazes".format(len(blocked)))
+        mazes[blocked] = repair_mazes(rng, mazes[blocked])
+
+    return mazes
+
+
+# same layout as the obstacle part of the map descriptor: rows from the bottom up, padded at the end to whole bytes
+def encode_mazes(mazes):
+    count, height, width = mazes.shape
+    bits = mazes[:, ::-1, :].reshape(count, height * width)
+
+    return [row.tobytes().hex() for row in np.packbits(bits, axis=1)]
+
+
+def write_mazes(directory, descriptors):
+    os.makedirs(directory, exist_ok=True)
+    digits = len(str(max(len(descriptors) - 1, 0)))
+    for i, descriptor in enumerate(descriptors):
+        with open(os.path.join(directory, "maze_{}.txt".format(str(i).zfill(digits))), "w") as f:
+            f.write(descriptor + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='MDP Maze Generator, writes random reachable arenas as map descriptor files'
+    )
+    parser.add_argument("output", help="Directory to write the maze files to")
+    parser.add_argument("-n", "--count", type=int, default=100, help="Number of mazes")
+    parser.add_argument("-s", "--seed", type=int, default=None, help="Seed, the same seed gives the same corpus")
+    parser.add_argument("-d", "--density", type=float, default=0.1, help="Fraction of the arena covered by blocks")
+    parser.add_argument("--height", type=int, default=config.map_size['height'])
+    parser.add_argument("--width", type=int, default=config.map_size['width'])
+    parser.add_argument("--shapes", type=parse_shapes, default=None,
+                        help="Block shape distribution, e.g. 1x1:3,1x2:1,2x2:1 (height x width : weight)")
+    parser.add_argument("-v", "--verbose", help="Increase output verbosity", action="store_true")
+
+    args = parser.parse_args()
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    start = time.time()
+    mazes = generate_mazes(args.count, height=args.height, width=args.width, density=args.density,
+                           shapes=args.shapes, seed=args.seed)
+    descriptors = encode_mazes(mazes)
+    logging.info("Generated {} mazes in {:0.2f} second".format(args.count, time.time() - start))
+
+    write_mazes(args.output, descriptors)
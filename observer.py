@@ -0,0 +1,15 @@
+# receives everything the engine wants to show, the Tk simulator is one of these
+class MapObserver:
+    def update_cell(self, x, y):
+        pass
+
+    # the cells one sensing changed, as a list of (x, y)
+    def update_cells(self, cells):
+        for x, y in cells:
+            self.update_cell(x, y)
+
+    def update_map(self, radius=2, full=False):
+        pass
+
+    def exploration_completed(self, explored_hex, obstacles_hex):
+        pass
@@ -1,38 +1,41 @@
 import math
-import socket
-from time import sleep
+import asyncio
+from collections import deque
 
 from comms import *
 from robot import *
 from utils import *
-from constants import arduino_queue
+from fastest_path_algo import compress_movements
+from map_publisher import MapBroadcaster
 
 
 class RealRobot(Robot):
+    streams = True
+
     def __init__(self, handler):
 
         super().__init__(handler)
-        family = socket.AF_INET
-        socket_type = socket.SOCK_STREAM
-        self.socket = socket.socket(family, socket_type)
-        self.socket.settimeout(1)
+        self.transport = Transport()
         self.connected = False
         self.port = 1273
         self.host = ""
-        self.listener = None
+        self.map_broadcaster = None
+        # (sequence number, command) sent ahead of the move being made, the arduino runs them in order
+        self.streamed = deque()
+        self.sequence = 0
 
     def connect(self, host):
         self.host = host
 
         try:
-            self.socket.connect((self.host, self.port))
-            self.connected = True
+            self.connected = self.transport.connect(self.host, self.port)
             logging.info("Connection established.")
-            self.listener = ListenerThread(name='producer', socket=self.socket, handler=self.handler)
-            self.listener.start()
-            self.send('c\ns\n')
+            if self.map_broadcaster is None:
+                self.map_broadcaster = MapBroadcaster(self.handler.map_publisher, self.send)
+                self.map_broadcaster.start()
+            self.send('c\ns\n', replies=1)
             # self.send('s')
-        except socket.error as error:
+        except (OSError, asyncio.TimeoutError) as error:
             self.connected = False
             logging.info("Unable to establish connection. " + str(error))
 
@@ -40,30 +43,46 @@ class RealRobot(Robot):
 
 
     def disconnect(self):
+        if self.map_broadcaster is not None:
+            self.map_broadcaster.stop()
+            # a message it is sending would reconnect the link once it is closed
+            self.map_broadcaster.join()
+            logging.info("Map updates: {}".format(self.map_broadcaster.get_stats()))
+            self.map_broadcaster = None
+
+        logging.info("Link: {}".format(self.transport.stats.snapshot()))
+        for line in self.transport.stats.dump():
+            logging.info("Link " + line)
+
         try:
-            self.socket.shutdown(1)
-            self.socket.close()
+            self.transport.disconnect()
             self.connected = False
             logging.info("Socket closed.")
-        except socket.error as error:
+        except OSError as error:
             logging.info("Unable to close socket. " + str(error))
             return False
 
         return True
 
-    def send(self, msg):
+    def close(self):
+        if self.connected or self.map_broadcaster is not None:
+            self.disconnect()
+        self.transport.close()
+
+    def send(self, msg, replies=0):
         # for x in range(config.map_size['height']):
         #     logging.debug(map_virtual_w[x])
 
-        if not self.connected:
+        if not self.transport.connected:
             self.connect(self.host)
 
-        if self.connected:
+        if self.transport.connected:
             logging.debug("[Info] Sending message: " + str(msg))
-            try:
-                self.socket.sendall(str.encode(msg))
-            except socket.error as error:
-                logging.info("Unable to send message. " + str(error))
+            # queued on the transport loop, which writes messages from every thread in order
+            return self.transport.send(msg, replies)
+
+        logging.info("Unable to send message, not connected.")
+        return False
 
     def get_msg(self):
         # Handle other events
@@ -87,11 +106,24 @@ class RealRobot(Robot):
         #         continue
 
         # Handle arduino events
-        while arduino_queue.empty():
-            sleep(0.05)
-
-        msg = arduino_queue.get()
-        return msg.split()
+        self.wait_reply()
+        return self.transport.get_arduino()
+
+    # waits for the next sensor line. A lost reply is asked for again with s, which reads the sensors without
+    # moving, so the move it answers is never repeated.
+    def wait_reply(self):
+        retries = config.link_timeouts['retries']
+        for attempt in range(retries + 1):
+            try:
+                self.transport.wait_arduino()
+                return
+            except TimeoutError as error:
+                if attempt == retries:
+                    raise TimeoutError("The arduino sent no sensor reading, asked again {} times".format(
+                        retries)) from error
+                logging.info("[ARDUINO] {}, asking for the reading again".format(error))
+                self.transport.stats.clear_pending()
+                self.send('s\n', replies=1)
 
     def receive(self):
         msg = self.get_msg()
@@ -120,20 +152,53 @@ class RealRobot(Robot):
 
         return out
 
-    def move(self, sense, ir, steps=1):
-        # Calibration
-        can_calibrate = self.handler.map.find_left_wall_or_obstacle(self.x, self.y, self.handler.robot.bearing)
+    # the arduino command for a move made from the given pose and the number of sensor lines it answers with
+    def get_command(self, movement, steps, x, y, bearing):
+        if movement == MOVEMENT.LEFT:
+            return 'l83\n', 1
 
-        if can_calibrate:
-            self.send('c\nf' + str(steps) + '\n')
+        if movement == MOVEMENT.FORWARD:
+            command, replies = 'f' + str(steps) + '\n', steps
         else:
-            self.send('f' + str(steps) + '\n')
+            command, replies = 'r83\n', 1
 
+        # Calibration
+        if self.handler.map.find_left_wall_or_obstacle(x, y, bearing):
+            command = 'c\n' + command
+        return command, replies
+
+    # a command streamed ahead is already on its way, it is only sent when the move was not streamed
+    def send_command(self, command, replies):
+        if len(self.streamed) == 0:
+            self.send(command, replies)
+            return
+
+        sequence, streamed = self.streamed.popleft()
+        if streamed.split()[-1] != command.split()[-1]:
+            logging.info("[PIPELINE] Move {} is {} but {} was sent".format(sequence, command.split()[-1],
+                                                                         streamed.split()[-1]))
+        logging.debug("[PIPELINE] Making move {}".format(sequence))
+
+    def stream(self, moves):
+        for i, (movement, steps, x, y, bearing) in enumerate(moves[:config.pipeline['window']]):
+            if i < len(self.streamed):
+                continue
+
+            command, replies = self.get_command(movement, steps, x, y, bearing)
+            self.sequence += 1
+            self.streamed.append((self.sequence, command))
+            self.send(command, replies)
+            logging.debug("[PIPELINE] Streamed move {}: {}".format(self.sequence, command.split()[-1]))
+
+    def in_flight(self):
+        return len(self.streamed)
+
+    def move(self, sense, ir, steps=1):
+        self.send_command(*self.get_command(MOVEMENT.FORWARD, steps, self.x, self.y, self.bearing))
         self.send_map()
 
         if sense:
-            while arduino_queue.qsize() < 1:
-                sleep(0.1)
+            self.wait_reply()
 
         super().move(sense, ir=False, steps=steps)
         if ir:
@@ -149,12 +214,11 @@ class RealRobot(Robot):
         if ir:
             self.take_image(before_turn=True)
 
-        self.send('l83\n')
+        self.send_command(*self.get_command(MOVEMENT.LEFT, 1, self.x, self.y, self.bearing))
         self.send_map()
 
         if sense:
-            while arduino_queue.qsize() < 1:
-                sleep(0.1)
+            self.wait_reply()
 
         super().left(sense, ir=False)
         if ir:
@@ -165,46 +229,40 @@ class RealRobot(Robot):
         if ir:
             self.take_image(before_turn=True)
 
-        can_calibrate = self.handler.map.find_left_wall_or_obstacle(self.x, self.y, self.handler.robot.bearing)
-
-        if can_calibrate:
-            self.send('c\nr83\n')
-        else:
-            self.send('r83\n')
+        self.send_command(*self.get_command(MOVEMENT.RIGHT, 1, self.x, self.y, self.bearing))
         self.send_map()
 
         if sense:
-            while arduino_queue.qsize() < 1:
-                sleep(0.1)
+            self.wait_reply()
 
         super().right(sense, ir=False)
         if ir:
             self.take_image()
 
     def left_diag(self):
-        self.send('l33\n')
+        self.send('l33\n', replies=1)
         self.send_map()
 
-        while arduino_queue.qsize() < 1:
-            sleep(0.1)
+        # the sensors face no grid direction halfway through a turn, the reading is dropped so it is not
+        # taken for the reply to the next command
+        self.get_msg()
 
         super().left_diag()
 
     def right_diag(self):
-        self.send('r33\n')
+        self.send('r33\n', replies=1)
         self.send_map()
 
-        while arduino_queue.qsize() < 1:
-            sleep(0.1)
+        self.get_msg()
 
         super().right_diag()
 
-    def send_map(self):
-        explored_hex, obstacles_hex = self.handler.map.create_map_descriptor()
-        json_str = "M{\"map\": [{\"length\": 300, \"explored\": \"" + explored_hex + "\", \"obstacle\": \"" + \
-                   obstacles_hex + "\"}], \"robotPosition\":[" + str(self.x) + ", " + str(
-            self.y) + "," + self.convert_to_degrees() + "]}\n"
-        self.send(json_str)
+    # hands the pose to the broadcaster thread, so motion commands never wait on the tablet
+    def send_map(self, keyframe=False):
+        if self.map_broadcaster is not None:
+            self.map_broadcaster.notify(self.x, self.y, self.convert_to_degrees(), keyframe)
+        else:
+            self.send(self.handler.map_publisher.next_message(self.x, self.y, self.convert_to_degrees(), keyframe))
 
     def convert_to_degrees(self):
         if self.bearing == Bearing.NORTH:
@@ -217,46 +275,18 @@ class RealRobot(Robot):
             return '270'
 
     def execute_fastest_path(self, movements):
-        forward = 0
-        forward_diag = 0
-        agg_movements = ['g']
-
-        for movement in movements:
-            if movement == MOVEMENT.FORWARD:
-                forward += 1
-            elif movement == MOVEMENT.FORWARD_DIAG:
-                forward_diag += 1
-            else:
-                if forward > 0:
-                    agg_movements.append('f{:0>2d}'.format(forward))
-                    forward = 0
-
-                if forward_diag > 0:
-                    agg_movements.append('h{:0>2d}'.format(forward_diag))
-                    forward_diag = 0
-
-                if movement == MOVEMENT.LEFT_DIAG:
-                    agg_movements.append('l33')
-                elif movement == MOVEMENT.RIGHT_DIAG:
-                    agg_movements.append('r33')
-                elif movement == MOVEMENT.LEFT:
-                    agg_movements.append('l83')
-                else:
-                    agg_movements.append('r83')
-
-        if forward > 0:
-            agg_movements.append('f{:0>2d}'.format(forward))
-        elif forward_diag > 0:
-            agg_movements.append('h{:0>2d}'.format(forward_diag))
-
-        agg_movements.append('\n')
-
-        self.send(''.join(agg_movements))
-        self.send_map()
+        self.send('g' + ''.join(compress_movements(movements)) + '\n')
+        self.send_map(keyframe=True)
 
         # super().execute_fastest_path(movements)
         return
 
+    # sensor replies to commands sent before the reset are stale
+    def reset(self):
+        super().reset()
+        self.streamed.clear()
+        self.transport.clear_arduino()
+
     def take_image(self, before_turn=False):
         # logging.debug('Take image')
         try:
@@ -4,8 +4,33 @@ import config
 from constants import *
 from map import *
 
+# sensor positions relative to the robot center, indexed by bearing / 2. Front sensors face the bearing and are
+# listed as [[x offsets], [y offsets]] from left to right, the left sensors face the bearing to the left and are
+# listed as [x, y] front then middle, the right sensor faces the bearing to the right
+FRONT_SENSOR_OFFSETS = [
+    [[-1, 0, 1], [-1, -1, -1]],
+    [[1, 1, 1], [-1, 0, 1]],
+    [[1, 0, -1], [1, 1, 1]],
+    [[-1, -1, -1], [1, 0, -1]]
+]
+LEFT_SENSOR_OFFSETS = [
+    [[-1, -1], [-1, 0]],
+    [[1, -1], [0, -1]],
+    [[1, 1], [1, 0]],
+    [[-1, 1], [0, 1]]
+]
+RIGHT_SENSOR_OFFSETS = [
+    [1, 0],
+    [0, 1],
+    [-1, 0],
+    [0, -1]
+]
+
 
 class Robot:
+    # whether commands of a committed plan can be sent ahead of the move being made, see stream
+    streams = False
+
     def __init__(self, handler):
         # center of robot
         self.y = config.map_size['height'] - 2
@@ -19,6 +44,8 @@ class Robot:
         # self.ir_current_island = True
         self.map_img_rec = [[0 for _ in range(config.map_size['width'])] for _ in range(config.map_size['height'])]
         self.prev_loc = [((1,18),Bearing.NORTH)] # tuple of location coordinates and bearing
+        self.move_count = 0
+        self.turn_count = 0
 
     # check that center of robot is not at the border and lies within the map
     def validate(self, x, y):
@@ -29,6 +56,7 @@ class Robot:
     def move(self, sense, ir, steps=1):
         logging.debug('f' + str(steps))
         self.consecutive_forward += 1
+        self.move_count += steps
         for _ in range(steps):
             if self.bearing == Bearing.NORTH:
                 if self.validate(0, -1) and self.north_is_free():
@@ -44,11 +72,11 @@ class Robot:
                     self.x -= 1
             if sense:
                 self.sense()
-                self.handler.simulator.update_map(radius=3)
+                self.handler.render(radius=3)
             # self.add_prev_location()
         if ir:
             self.take_image()
-        self.handler.simulator.update_map(radius=3)
+        self.handler.render(radius=3)
 
 
     def left(self, sense, ir):
@@ -57,12 +85,13 @@ class Robot:
         # rotate anticlockwise by 90 deg
         logging.debug('l90')
         self.bearing = Bearing.prev_bearing(self.bearing)
+        self.turn_count += 1
         self.just_turn = True
         if sense:
             self.sense()
         if ir:
             self.take_image()
-        self.handler.simulator.update_map(radius=3)
+        self.handler.render(radius=3)
         # self.add_prev_location()
 
     def right(self, sense, ir):
@@ -71,26 +100,30 @@ class Robot:
         logging.debug('r90')
         # rotate clockwise by 90 deg
         self.bearing = Bearing.next_bearing(self.bearing)
+        self.turn_count += 1
         self.just_turn = True
         if sense:
             self.sense()
         if ir:
             self.take_image()
-        self.handler.simulator.update_map(radius=3)
+        self.handler.render(radius=3)
         # self.add_prev_location()
 
     def left_diag(self):
         logging.debug('l33')
         self.bearing = Bearing.prev_bearing_diag(self.bearing)
+        self.turn_count += 1
         # self.add_prev_location()
 
     def right_diag(self):
         logging.debug('r33')
         self.bearing = Bearing.next_bearing_diag(self.bearing)
+        self.turn_count += 1
         # self.add_prev_location()
 
     def move_diag(self, steps=1):
         logging.debug('h' + str(steps))
+        self.move_count += steps
         if self.bearing == Bearing.NORTH_EAST:
             self.x += steps
             self.y -= steps
@@ -105,6 +138,19 @@ class Robot:
             self.y -= steps
         # self.add_prev_location()
 
+    # moves is the committed plan as (movement, steps, x, y, bearing) with the pose before each move, the first
+    # one is made next. Nothing is sent ahead of time unless the robot streams.
+    def stream(self, moves):
+        return
+
+    # commands sent ahead of time which have not been made yet
+    def in_flight(self):
+        return 0
+
+    # releases what the robot holds before it is replaced
+    def close(self):
+        return
+
     def calibrate(self):
         logging.debug("CALIBRATE")
 
@@ -114,25 +160,25 @@ class Robot:
     # check obstacles
     def north_is_free(self):
         for i in range(3):
-            if map_virtual[self.y - 2][self.x - i + 1] == 1:
+            if self.map.map_virtual[self.y - 2, self.x - i + 1] == 1:
                 return False
         return True
 
     def south_is_free(self):
         for i in range(3):
-            if map_virtual[self.y + 2][self.x - i + 1] == 1:
+            if self.map.map_virtual[self.y + 2, self.x - i + 1] == 1:
                 return False
         return True
 
     def east_is_free(self):
         for i in range(3):
-            if map_virtual[self.y - i + 1][self.x + 2] == 1:
+            if self.map.map_virtual[self.y - i + 1, self.x + 2] == 1:
                 return False
         return True
 
     def west_is_free(self):
         for i in range(3):
-            if map_virtual[self.y - i + 1][self.x - 2] == 1:
+            if self.map.map_virtual[self.y - i + 1, self.x - 2] == 1:
                 return False
         return True
 
@@ -155,52 +201,6 @@ class Robot:
     def receive(self):
         raise NotImplementedError
 
-    def sense_front(self, location, bearing, sensor_data):
-
-        sensor_offsets = [
-            [[-1, 0, 1], [-1, -1, -1]],
-            [[1, 1, 1], [-1, 0, 1]],
-            [[1, 0, -1], [1, 1, 1]],
-            [[-1, -1, -1], [1, 0, -1]]
-        ]
-        offset = sensor_offsets[int(bearing / 2)]
-
-        self.handler.update_map(location[0] + offset[0][0], location[1] + offset[1][0], sensor_data[0],
-                                bearing, config.sensor_range['front_left'])
-        self.handler.update_map(location[0] + offset[0][1], location[1] + offset[1][1], sensor_data[1],
-                                bearing, config.sensor_range['front_middle'])
-        self.handler.update_map(location[0] + offset[0][2], location[1] + offset[1][2], sensor_data[2],
-                                bearing, config.sensor_range['front_right'])
-
-    # call update map for left sensor
-    def sense_left(self, location, bearing, sensor_data):
-
-        sensor_offsets = [
-            [[-1, -1], [-1, 0]],
-            [[1, -1], [0, -1]],
-            [[1, 1], [1, 0]],
-            [[-1, 1], [0, 1]]
-        ]
-        offset = sensor_offsets[int(bearing / 2)]
-        self.handler.update_map(location[0] + offset[0][0], location[1] + offset[0][1], sensor_data[0],
-                                Bearing.prev_bearing(bearing), config.sensor_range['left_front'])
-        self.handler.update_map(location[0] + offset[1][0], location[1] + offset[1][1], sensor_data[1],
-                                Bearing.prev_bearing(bearing), config.sensor_range['left_middle'])
-
-    # call update map for right sensor
-    def sense_right(self, location, bearing, sensor_data):
-
-        sensor_offsets = [
-            [1, 0],
-            [0, 1],
-            [-1, 0],
-            [0, -1]
-        ]
-        offset = sensor_offsets[int(bearing / 2)]
-
-        self.handler.update_map(location[0] + offset[0], location[1] + offset[1], sensor_data,
-                                Bearing.next_bearing(bearing), config.sensor_range['right'])
-
     # sense simulated sensor
     def sense(self, backtrack=0):
         sensor_data = self.receive()
@@ -209,9 +209,7 @@ class Robot:
         bearing = self.bearing
 
         if self.update_map:
-            self.sense_front(location, bearing, sensor_data[:3])
-            self.sense_left(location, bearing, sensor_data[3:5])
-            self.sense_right(location, bearing, sensor_data[5])
+            self.handler.update_sensed(location[0], location[1], bearing, sensor_data)
 
         for i in range(1, backtrack + 1):
             if bearing == Bearing.NORTH:
@@ -242,6 +240,8 @@ class Robot:
         self.bearing = Bearing.NORTH
         self.just_turn = False
         self.prev_loc = [((1,18),Bearing.NORTH)]
+        self.move_count = 0
+        self.turn_count = 0
         for i in range(config.map_size['height']):
             for j in range(config.map_size['width']):
                 self.map_img_rec[i][j] = 0
@@ -365,7 +365,7 @@ class Robot:
             self.handler.move(steps=num_move, sense=False, ir=False)
 
         if len(movements) > 0:
-            self.handler.simulator.job = self.handler.simulator.root.after(1000, self.execute_fastest_path, movements)
+            self.handler.schedule(1000, self.execute_fastest_path, movements)
 
     def stop_ir_current_island(self):
         # self.ir_current_island = False
@@ -0,0 +1,108 @@
+import numpy as np
+
+import config
+from constants import Bearing
+from robot import FRONT_SENSOR_OFFSETS, LEFT_SENSOR_OFFSETS, RIGHT_SENSOR_OFFSETS
+
+# the cell past the end of the arena, blocks every ray
+OUTSIDE = np.ones(1, dtype=np.uint8)
+
+# cell offset of a step along each of the north, east, south and west bearings
+RAY_STEPS = {
+    Bearing.NORTH: (0, -1),
+    Bearing.EAST: (1, 0),
+    Bearing.SOUTH: (0, 1),
+    Bearing.WEST: (-1, 0)
+}
+
+
+# (x offset, y offset, bearing the sensor faces, range) of every sensor for a robot facing bearing, in the
+# order of Robot.receive
+def get_sensors(bearing):
+    front = FRONT_SENSOR_OFFSETS[int(bearing / 2)]
+    left = LEFT_SENSOR_OFFSETS[int(bearing / 2)]
+    right = RIGHT_SENSOR_OFFSETS[int(bearing / 2)]
+    left_bearing = Bearing.prev_bearing(bearing)
+
+    return [(front[0][0], front[1][0], bearing, config.sensor_range['front_left']),
+            (front[0][1], front[1][1], bearing, config.sensor_range['front_middle']),
+            (front[0][2], front[1][2], bearing, config.sensor_range['front_right']),
+            (left[0][0], left[0][1], left_bearing, config.sensor_range['left_front']),
+            (left[1][0], left[1][1], left_bearing, config.sensor_range['left_middle']),
+            (right[0], right[1], Bearing.next_bearing(bearing), config.sensor_range['right'])]
+
+
+# What the sensors see from a pose, for simulating them and for choosing where to explore next. Every sensor of
+# every pose is cast once into a ray of the cells Handler.update_sensed marks for it, nearest first, so reading
+# the sensors or scoring all the poses of the arena against the current map is a handful of array operations.
+# A ray stops at the first obstacle, which is still seen, and unexplored cells are taken to be free with a fixed
+# probability when scoring.
+class SensorModel:
+    def __init__(self, height=config.map_size['height'], width=config.map_size['width']):
+        self.height = height
+        self.width = width
+        self.rays = self.build_rays()
+        # range of every sensor, the same whichever way the robot faces
+        self.ranges = np.array([sensor_range for _, _, _, sensor_range in get_sensors(Bearing.NORTH)])
+
+    # rays[y, x, bearing / 2, sensor] holds the flat index y * width + x of the cells the sensor sees, padded
+    # with height * width, one past the arena, which is never seen and blocks the ray. Every ray is padded at
+    # least once, so every ray has a first hit.
+    def build_rays(self):
+        sensors = [get_sensors(bearing) for bearing in RAY_STEPS]
+        length = max(sensor_range for _, _, _, sensor_range in sensors[0]) + 1
+        outside = self.height * self.width
+        rays = np.full((self.height, self.width, len(sensors), len(sensors[0]), length), outside, dtype=np.intp)
+
+        for y in range(self.height):
+            for x in range(self.width):
+                for i, bearing_sensors in enumerate(sensors):
+                    for j, (dx, dy, bearing, sensor_range) in enumerate(bearing_sensors):
+                        step_x, step_y = RAY_STEPS[bearing]
+                        for k in range(sensor_range):
+                            cell_x = x + dx + (k + 1) * step_x
+                            cell_y = y + dy + (k + 1) * step_y
+                            if not (0 <= cell_x < self.width and 0 <= cell_y < self.height):
+                                break
+                            rays[y, x, i, j, k] = cell_y * self.width + cell_x
+        return rays
+
+    # expected number of unexplored cells the rays see on the current map, summed over the last two axes
+    def ray_gain(self, map, rays, free_probability):
+        explored = map.map_is_explored.reshape(-1) != 0
+        obstacle = map.map_virtual.reshape(-1) != 0
+
+        # one more cell for the padding
+        unexplored = np.append(~explored, False).astype(float)
+        passes = np.append(np.where(explored, ~obstacle, free_probability), 0.0)
+
+        # the chance a cell is reached is the chance every cell before it on the ray lets the ray through
+        reached = np.cumprod(passes[rays], axis=-1)
+        reached = np.concatenate((np.ones(reached.shape[:-1] + (1,)), reached[..., :-1]), axis=-1)
+        return (unexplored[rays] * reached).sum(axis=(-2, -1))
+
+    # gain[y, x, bearing / 2] for every pose of the arena, whether the robot can stand there or not
+    def expected_gain(self, map, free_probability):
+        return self.ray_gain(map, self.rays, free_probability)
+
+    def pose_gain(self, map, x, y, bearing, free_probability):
+        return float(self.ray_gain(map, self.rays[y, x, int(bearing / 2)], free_probability))
+
+    # what the six sensors read from a pose over an arena of obstacles, in the order of Robot.receive: the
+    # number of free cells in front of each sensor, up to its range
+    def read(self, obstacles, x, y, bearing):
+        blocked = np.concatenate((obstacles.reshape(-1), OUTSIDE))
+        return blocked[self.rays[y, x, int(bearing / 2)]].argmax(axis=1).tolist()
+
+    # the cells the sensors saw from a pose given what they read, sensor by sensor and nearest first, as the
+    # arrays x, y, distance from the sensor and whether the cell is the obstacle that stopped the ray. A
+    # reading short of its range ends on an obstacle, unless the ray left the arena there.
+    def get_seen(self, x, y, bearing, readings):
+        rays = self.rays[y, x, int(bearing / 2)]
+        dist = np.arange(rays.shape[1])
+        readings = np.asarray(readings)[:, None]
+
+        hit = (dist == readings) & (readings < self.ranges[:, None])
+        seen = ((dist < readings) | hit) & (rays < self.height * self.width)
+        cells = rays[seen]
+        return cells % self.width, cells // self.width, np.broadcast_to(dist, rays.shape)[seen], hit[seen]
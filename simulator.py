@@ -5,13 +5,15 @@ from tkinter import scrolledtext
 from tkinter.filedialog import askopenfilename
 
 import config # Map and robot configurations needed here
-# from comms import *
+from comms import START_EXPLORATION, START_FASTEST_PATH, WAYPOINT, RESET, GET_MAP, STOP_IR
 from constants import * # Bearing class needed here
 from handler import Handler # Handler class needed here
+from link_stats import link_stats
+from observer import MapObserver
 from map import * 
 
 
-class Simulator:
+class Simulator(MapObserver):
     def __init__(self):
         self.robot_simulation = True
 
@@ -130,15 +132,18 @@ class Simulator:
         self.exploration_dropdown = ttk.Combobox(parameter_pane, state="readonly",
                                                  values=["Left Wall Hugging", "Left Wall Hugging (Return Home)",
                                                          "Left Wall Hugging (Optimized, Return Home)",
+                                                         "Left Wall Hugging (Optimized, Return Home, D* Lite)",
+                                                         "Information Gain", "Information Gain (Return Home)",
                                                          "Image Recognition", "Image Recognition (Return Home)",
                                                          "Image Recognition (Partial, Return Home)"])
-        self.exploration_dropdown.current(4)
+        self.exploration_dropdown.current(7)
         self.exploration_dropdown.grid(column=0, row=11, pady=(0, 10), sticky=EW)
 
         fp_algo_label = ttk.Label(parameter_pane, text="FP Algo:")
         fp_algo_label.grid(column=0, row=12, sticky=EW)
         self.fp_dropdown = ttk.Combobox(parameter_pane, state="readonly",
-                                        values=["A* Search", "A* Search (With Diagonals)", "Left Wall Hugging"])
+                                        values=["A* Search", "A* Search (With Diagonals)", "D* Lite",
+                                                "D* Lite (With Diagonals)", "Left Wall Hugging"])
         self.fp_dropdown.current(1)
         self.fp_dropdown.grid(column=0, row=13, pady=(0, 10), sticky=EW)
 
@@ -168,8 +173,14 @@ class Simulator:
 
     def event_loop(self):
 
-        while not general_queue.empty():
-            msg = general_queue.get()
+        while not (control_queue.empty() and general_queue.empty()):
+            # stop and reset are handled before any other waiting command
+            if not control_queue.empty():
+                msg = control_queue.get()
+                link_stats.message_taken('control_queue')
+            else:
+                msg = general_queue.get()
+                link_stats.message_taken('general_queue')
 
             if msg[:3] == START_EXPLORATION:
                 logging.debug('Starting exploration')
@@ -186,7 +197,7 @@ class Simulator:
             elif msg[:3] == RESET:
                 self.reset()
             elif msg[:3] == GET_MAP:
-                self.robot.send_map()
+                self.robot.send_map(keyframe=True)
             elif msg == STOP_IR:
                 self.core.explorer.stop_ir()
                 logging.debug('Stopping IR')
@@ -201,13 +212,17 @@ class Simulator:
         self.core.findFP(int(self.steps_per_second.get()), int(self.goal_x.get()), int(self.goal_y.get()),
                          int(self.waypoint_x.get()), int(self.waypoint_y.get()), self.fp_dropdown.get())
 
+    def exploration_completed(self, explored_hex, obstacles_hex):
+        self.text_area.insert('end', explored_hex, '\n\n')
+        self.text_area.insert('end', obstacles_hex, '\n')
+
     def update_cell(self, x, y):
         # Start & End box
         if ((0 <= y <= 2) and (12 <= x <= 14)) or (17 <= y <= 19 and 0 <= x <= 2):
             color = 'gold'
         else:
-            if map_is_explored[y][x] == 0:
-                if map_sim[y][x] == 0:
+            if self.map.map_is_explored[y, x] == 0:
+                if self.map.map_sim[y, x] == 0:
                     color = 'gray64'
                 else:
                     color = 'light pink'
@@ -227,10 +242,10 @@ class Simulator:
         x = event.x // 40
         y = event.y // 40
 
-        if map_sim[y][x] == 0:
-            map_sim[y][x] = 1
+        if self.map.map_sim[y, x] == 0:
+            self.map.map_sim[y, x] = 1
         else:
-            map_sim[y][x] = 0
+            self.map.map_sim[y, x] = 0
         self.update_cell(x, y)
 
     def put_robot(self, x, y, bearing):
@@ -301,8 +316,6 @@ class Simulator:
     def reset(self):
         if self.job:
             self.root.after_cancel(self.job)
-        while not arduino_queue.empty():
-            arduino_queue.get()
         self.handler.reset()
         self.update_map(full=True)
 
@@ -0,0 +1,29 @@
+import pytest
+
+from comms import Transport, is_control_command
+
+
+def test_arduino_channel_keeps_every_reply():
+    transport = Transport()
+    try:
+        lines = [memoryview("{} 1 2 3 4 5".format(i).encode()) for i in range(100)]
+        for line in lines:
+            transport.loop.call_soon_threadsafe(transport.route_line, line, len(line) + 1)
+
+        for i in range(100):
+            assert transport.get_arduino(timeout=1)[0] == str(i).encode()
+    finally:
+        transport.close()
+
+
+@pytest.mark.parametrize("msg, control", [
+    ("RS|", True),
+    ("RS|1", True),
+    ("I", True),
+    ("I|2,3", True),
+    ("ES|", False),
+    ("WP|3,4", False),
+    ("IR|1", False),
+])
+def test_control_commands_are_matched_by_their_token(msg, control):
+    assert is_control_command(msg) == control
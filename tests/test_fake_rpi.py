@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+
+import config
+from fake_rpi import FakeRPi
+from handler import Handler
+
+# maze_02 and maze_10 of maze_generator.py -n 40 -s 1 -d 0.1, where the way home passes the start cell on its
+# way to the waypoint next to it
+HOMING_MAZES = [
+    "000e004000000000008100020100001c0000000008001000a381400000000000c00080000000",
+    "001800101e20004000a201440088010000000000000007080005a00840000040000000000000"
+]
+
+
+@pytest.fixture
+def fake_rpi():
+    servers = []
+
+    def start(descriptor, **kwargs):
+        rpi = FakeRPi(descriptor, **kwargs)
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_server(rpi.handle, '127.0.0.1', 0))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        servers.append((loop, server, thread))
+        return server.sockets[0].getsockname()[1]
+
+    yield start
+
+    for loop, server, thread in servers:
+        loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+
+
+@pytest.mark.parametrize("descriptor", HOMING_MAZES)
+@pytest.mark.parametrize("mode", ["Left Wall Hugging (Optimized, Return Home)", "Information Gain (Return Home)"])
+def test_streamed_return_home_stops_at_start(fake_rpi, monkeypatch, descriptor, mode):
+    monkeypatch.setitem(config.pipeline, 'window', 3)
+    port = fake_rpi(descriptor)
+
+    handler = Handler(robot_simulation=False)
+    handler.map.decode_map_descriptor(descriptor)
+    handler.robot.port = port
+    # reset clears the arduino channel, which would drop the reply to the sensing connect asks for
+    handler.reset()
+    assert handler.robot.connect('127.0.0.1')
+    try:
+        handler.core.explore(-1, 100, 360, mode)
+        handler.run(max_ticks=3000)
+
+        assert len(handler.pending) == 0
+        assert handler.robot.get_location() == (1, 18)
+        assert handler.robot.in_flight() == 0
+    finally:
+        handler.robot.close()
+
+
+def test_lost_replies_are_asked_for_again(fake_rpi, monkeypatch):
+    monkeypatch.setitem(config.link_timeouts, 'reply', 0.05)
+    port = fake_rpi(HOMING_MAZES[0], loss=0.2, seed=1)
+
+    handler = Handler(robot_simulation=False)
+    handler.map.decode_map_descriptor(HOMING_MAZES[0])
+    handler.robot.port = port
+    handler.reset()
+    assert handler.robot.connect('127.0.0.1')
+    try:
+        handler.core.explore(-1, 100, 360, "Left Wall Hugging (Optimized, Return Home)")
+
+        # without a timeout the first lost reply blocks the run for good
+        assert handler.run(max_ticks=50) == 50
+        assert handler.robot.transport.stats.sent['s'] > 1
+    finally:
+        handler.robot.close()
+
+
+def test_silent_arduino_raises(fake_rpi, monkeypatch):
+    monkeypatch.setitem(config.link_timeouts, 'reply', 0.05)
+    monkeypatch.setitem(config.link_timeouts, 'retries', 2)
+    port = fake_rpi(HOMING_MAZES[0], loss=1)
+
+    handler = Handler(robot_simulation=False)
+    handler.robot.port = port
+    assert handler.robot.connect('127.0.0.1')
+    try:
+        with pytest.raises(TimeoutError, match="asked again 2 times"):
+            handler.robot.sense()
+    finally:
+        handler.robot.close()
+
+
+def test_connect_closes_the_previous_transport(fake_rpi):
+    port = fake_rpi(HOMING_MAZES[0])
+
+    handler = Handler(robot_simulation=False)
+    handler.robot.port = port
+    assert handler.robot.connect('127.0.0.1')
+    previous = handler.robot.transport
+
+    # nothing listens on the default port, the new robot only has to replace the old one
+    handler.connect('127.0.0.1')
+    try:
+        assert handler.robot.transport is not previous
+        assert not previous.thread.is_alive()
+        assert previous.loop.is_closed()
+    finally:
+        handler.robot.close()
+
+    assert not handler.robot.transport.thread.is_alive()
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from map import Map
+
+
+# two sensors reading the same cell, (6, 7) and (7, 7) are seen twice
+XS = np.array([6, 7, 6, 7, 8])
+YS = np.array([7, 7, 7, 7, 7])
+
+
+@pytest.mark.parametrize("is_sim, readings", [
+    (False, np.array([1000, -10, 500, -1000, 10])),
+    (True, np.array([1, 0, 0, 1, 1])),
+])
+def test_a_cell_seen_twice_takes_every_reading(is_sim, readings):
+    batched = Map()
+    changed = batched.mark_explored_cells(XS, YS, readings, is_sim)
+
+    one_by_one = Map()
+    for x, y, reading in zip(XS, YS, readings):
+        one_by_one.mark_explored(x, y, 1, reading, is_sim)
+
+    assert np.array_equal(batched.map_virtual_w, one_by_one.map_virtual_w)
+    assert np.array_equal(batched.map_virtual, one_by_one.map_virtual)
+    assert np.array_equal(batched.map_cspace_count, one_by_one.map_cspace_count)
+    assert batched.explored_count == one_by_one.explored_count == Map().explored_count + 3
+    assert changed == [(6, 7), (7, 7), (8, 7)]
+    if not is_sim:
+        assert batched.map_virtual_w[7, 6] == 1500
+        assert batched.map_virtual_w[7, 7] == -1010
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from maze_generator import generate_mazes, is_reachable, place_blocks, repair_mazes, DEFAULT_SHAPES
+
+
+@pytest.mark.parametrize("density", [0.1, 0.2, 0.3])
+def test_every_maze_is_reachable(density):
+    mazes = generate_mazes(2000, density=density, seed=3)
+
+    assert is_reachable(mazes).all()
+
+
+def test_same_seed_gives_the_same_corpus():
+    assert (generate_mazes(200, density=0.2, seed=5) == generate_mazes(200, density=0.2, seed=5)).all()
+
+
+def test_repair_only_clears_blocks():
+    rng = np.random.default_rng(7)
+    mazes = place_blocks(rng, 2000, 20, 15, 0.2, DEFAULT_SHAPES)
+    blocked = mazes[~is_reachable(mazes)]
+
+    repaired = repair_mazes(rng, blocked.copy())
+
+    assert is_reachable(repaired).all()
+    assert not (repaired & ~blocked).any()
+    # a path from the start to the goal covers 90 cells at most, the cheapest one far fewer
+    assert (blocked.sum(axis=(1, 2)) - repaired.sum(axis=(1, 2))).mean() < 10